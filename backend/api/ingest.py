@@ -78,24 +78,16 @@ async def ingest_folder(request: IngestRequest):
         chunks_created = 0
         
         try:
-            # 1. Scan folder for files
+            # 1. Scan folder for files; each file is processed as soon as the
+            # scan finds it rather than after the whole tree has been listed
             logger.info("Scanning folder for files...")
-            files = file_loader.scan_directory(folder_path, recursive=request.recursive)
-            logger.info(f"Found {len(files)} files to process")
-            
-            if not files:
-                return IngestResponse(
-                    status="completed",
-                    files_processed=0,
-                    chunks_created=0,
-                    processing_time_ms=(time.time() - start_time) * 1000
-                )
+            files = file_loader.scan_directory_iter(folder_path, recursive=request.recursive)
             
             # 2. Process each file with proper error handling and resource cleanup
             for file_info in files:
                 try:
-                    filepath = file_info['filepath']
-                    filename = file_info['filename']
+                    filepath = file_info.filepath
+                    filename = file_info.filename
                     logger.info(f"Processing file: {filename}")
                     
                     # Check if file already exists in vector store
@@ -132,7 +124,7 @@ async def ingest_folder(request: IngestRequest):
                     logger.info(f"Successfully processed {filename}: {len(chunks)} chunks")
                     
                 except Exception as file_error:
-                    logger.error(f"Error processing file {file_info.get('filename', 'unknown')}: {str(file_error)}")
+                    logger.error(f"Error processing file {file_info.filename}: {str(file_error)}")
                     continue
             
             processing_time = (time.time() - start_time) * 1000
@@ -22,7 +22,6 @@ logger = logging.getLogger(__name__)
 
 # Configuration constants
 STREAMING_WORDS_PER_CHUNK = 5
-STREAMING_DELAY_SECONDS = 0.05
 MAX_CHAT_HISTORY_ITEMS = 50
 CHAT_RATE_LIMIT = 30
 SEARCH_RATE_LIMIT = 50
@@ -80,6 +79,13 @@ async def get_rag_pipeline():
                 raise HTTPException(status_code=503, detail="RAG pipeline not available")
         return _rag_pipeline
 
+async def close_rag_pipeline():
+    """Close the RAG pipeline's async Ollama connections"""
+    global _rag_pipeline
+    if _rag_pipeline is not None:
+        await _rag_pipeline.aclose()
+        _rag_pipeline = None
+
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=1000, description="Search query")
     limit: int = Field(default=10, ge=1, le=50, description="Maximum number of results")
@@ -176,11 +182,13 @@ async def semantic_search(request: QueryRequest, http_request: Request):
             similarity_threshold=request.similarity_threshold
         )
         
-        # Convert to response format
+        # Convert to response format, fetching chunk details in one query
+        chunks_data = vector_store.get_chunks_metadata(
+            [chunk_id for chunk_id, _ in search_results]
+        )
         results = []
         for chunk_id, similarity_score in search_results:
-            # Get chunk details from database
-            chunk_data = vector_store.get_chunk_metadata(chunk_id)
+            chunk_data = chunks_data.get(chunk_id)
             if chunk_data:
                 results.append(SearchResult(
                     content=chunk_data.get('content', ''),
@@ -226,7 +234,7 @@ async def chat_with_rag(request: ChatRequest, http_request: Request):
         
         # Process query through RAG pipeline with error handling
         try:
-            rag_response = rag.query(
+            rag_response = await rag.aquery(
                 user_query=request.message,
                 chat_history=request.history,
                 use_context=request.use_rag
@@ -289,21 +297,46 @@ async def chat_with_rag_stream(request: ChatRequest, http_request: Request):
             status_event = f"event: status\ndata: {json.dumps({'message': 'Processing your request...'})}\n\n"
             yield status_event
             
-            # Process query through RAG pipeline with timeout protection
+            # Forward Ollama's chunks as they arrive; the final item is the
+            # complete RAGResult carrying sources and timing
+            rag_response = None
+            streamed_length = 0
+            stream = rag.astream_query(
+                user_query=request.message,
+                chat_history=request.history,
+                use_context=request.use_rag
+            )
             try:
-                rag_response = rag.query(
-                    user_query=request.message,
-                    chat_history=request.history,
-                    use_context=request.use_rag
-                )
+                async for item in stream:
+                    if not isinstance(item, str):
+                        rag_response = item
+                        break
+                    
+                    # Truncate extremely long responses to prevent memory issues
+                    if streamed_length + len(item) > MAX_RESPONSE_LENGTH:
+                        item = item[:MAX_RESPONSE_LENGTH - streamed_length] + "... [Response truncated]"
+                        logger.warning(f"Response truncated for {client_ip} at {MAX_RESPONSE_LENGTH} characters")
+                    streamed_length += len(item)
+                    
+                    try:
+                        chunk_event = f"event: chunk\ndata: {json.dumps({'content': item})}\n\n"
+                        yield chunk_event
+                    except (ValueError, TypeError) as json_error:
+                        logger.warning(f"Failed to serialize chunk for {client_ip}: {str(json_error)}")
+                        continue
+                    
+                    if streamed_length >= MAX_RESPONSE_LENGTH:
+                        break
             except Exception as rag_error:
                 logger.error(f"RAG pipeline error for {client_ip}: {str(rag_error)}", exc_info=True)
                 error_event = f"event: error\ndata: {json.dumps({'error': 'Failed to process request', 'code': 500})}\n\n"
                 yield error_event
                 return
+            finally:
+                await stream.aclose()
             
-            # Send sources first if available
-            if hasattr(rag_response, 'sources') and rag_response.sources:
+            # Send sources once the answer is in
+            if rag_response is not None and rag_response.sources:
                 try:
                     sources_data = {
                         "sources": [
@@ -321,46 +354,12 @@ async def chat_with_rag_stream(request: ChatRequest, http_request: Request):
                     yield sources_event
                 except (ValueError, TypeError) as json_error:
                     logger.warning(f"Failed to serialize sources for {client_ip}: {str(json_error)}")
-              # Stream response using sentence-based chunking for better readability
-            response_text = getattr(rag_response, 'response', '')
-            if response_text:
-                # Truncate extremely long responses to prevent memory issues
-                if len(response_text) > MAX_RESPONSE_LENGTH:
-                    response_text = response_text[:MAX_RESPONSE_LENGTH] + "... [Response truncated]"
-                    logger.warning(f"Response truncated for {client_ip} due to length: {len(response_text)}")
-                
-                try:
-                    # Split by sentences for more natural streaming
-                    import re
-                    sentences = re.split(r'(?<=[.!?])\s+', response_text)
-                    
-                    for i, sentence in enumerate(sentences):
-                        if sentence.strip():
-                            # Check for cancellation periodically
-                            if i % 5 == 0:
-                                await asyncio.sleep(0)  # Allow cancellation check
-                            
-                            chunk_data = {"content": sentence.strip() + " "}
-                            try:
-                                chunk_event = f"event: chunk\ndata: {json.dumps(chunk_data)}\n\n"
-                                yield chunk_event
-                            except (ValueError, TypeError) as json_error:
-                                logger.warning(f"Failed to serialize chunk for {client_ip}: {str(json_error)}")
-                                continue
-                            
-                            # Small delay for better streaming effect
-                            await asyncio.sleep(STREAMING_DELAY_SECONDS)
-                except Exception as stream_error:
-                    logger.error(f"Streaming error for {client_ip}: {str(stream_error)}")
-                    error_event = f"event: error\ndata: {json.dumps({'error': 'Streaming interrupted', 'code': 500})}\n\n"
-                    yield error_event
-                    return
             
             # Send completion with metadata
             try:
                 completion_data = {
                     "response_time_ms": float(getattr(rag_response, 'response_time_ms', (time.time() - start_time) * 1000)),
-                    "total_length": len(response_text),
+                    "total_length": streamed_length,
                     "source_count": len(getattr(rag_response, 'sources', []))
                 }
                 completion_event = f"event: complete\ndata: {json.dumps(completion_data)}\n\n"
@@ -163,6 +163,14 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"Error closing async vector store: {str(e)}")
     
+    # Close the RAG pipeline's async Ollama client
+    try:
+        from api.query import close_rag_pipeline
+        await close_rag_pipeline()
+        logger.info("RAG pipeline closed")
+    except Exception as e:
+        logger.error(f"Error closing RAG pipeline: {str(e)}")
+    
     # Clean up database pools and other resources
     try:
         from utils.resource_manager import cleanup_all_pools
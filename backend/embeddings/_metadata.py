@@ -0,0 +1,73 @@
+"""
+Encoding for the chunks.metadata column shared by the sync and async stores
+Metadata is stored as a msgpack BLOB when ormsgpack is installed; legacy
+JSON TEXT rows are still decoded so existing databases keep working
+"""
+import json
+import logging
+from typing import Any, Dict, Optional, Union
+
+try:
+    import ormsgpack
+    _HAVE_ORMSGPACK = True
+except ImportError:
+    ormsgpack = None
+    _HAVE_ORMSGPACK = False
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA user_version once legacy JSON TEXT rows have been converted
+_MSGPACK_SCHEMA_VERSION = 1
+
+def pack_metadata(metadata: Optional[Dict[str, Any]]) -> Union[bytes, str]:
+    """Encode metadata for storage: msgpack bytes, or JSON text without ormsgpack"""
+    if _HAVE_ORMSGPACK:
+        return ormsgpack.packb(metadata or {})
+    return json.dumps(metadata or {})
+
+def unpack_metadata(value: Optional[Union[bytes, str]]) -> Dict[str, Any]:
+    """Decode a stored metadata value written as either msgpack BLOB or JSON TEXT"""
+    if not value:
+        return {}
+
+    try:
+        if isinstance(value, (bytes, memoryview)):
+            if not _HAVE_ORMSGPACK:
+                logger.warning("Metadata stored as msgpack but ormsgpack is not installed")
+                return {}
+            return ormsgpack.unpackb(value)
+        return json.loads(value)
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Could not decode chunk metadata: {str(e)}")
+        return {}
+
+def migrate_metadata(conn) -> int:
+    """
+    Re-encode legacy JSON TEXT metadata rows as msgpack BLOBs in place
+
+    Runs once per database: the scan is skipped when PRAGMA user_version
+    shows the conversion already happened, and the version is bumped after.
+
+    Args:
+        conn: Open sqlite3 connection; the caller commits
+
+    Returns:
+        Number of rows converted
+    """
+    if not _HAVE_ORMSGPACK:
+        # Rows are still written as JSON; convert once ormsgpack is installed
+        return 0
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= _MSGPACK_SCHEMA_VERSION:
+        return 0
+
+    rows = conn.execute(
+        "SELECT chunk_id, metadata FROM chunks WHERE typeof(metadata) = 'text'"
+    ).fetchall()
+    if rows:
+        conn.executemany(
+            "UPDATE chunks SET metadata = ? WHERE chunk_id = ?",
+            ((pack_metadata(unpack_metadata(metadata)), chunk_id) for chunk_id, metadata in rows)
+        )
+    conn.execute(f"PRAGMA user_version = {_MSGPACK_SCHEMA_VERSION}")
+    return len(rows)
@@ -6,12 +6,12 @@ import aiosqlite
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
-import json
 import pickle
 import logging
 from dataclasses import asdict
 
 from embeddings.chunker import TextChunk
+from embeddings._metadata import pack_metadata, unpack_metadata
 from utils.caching import cache, AsyncMemoryCache
 from utils.resource_manager import ResourceManager
 
@@ -100,7 +100,7 @@ class AsyncVectorStore:
                     chunk_id TEXT PRIMARY KEY,
                     source_file TEXT NOT NULL,
                     content TEXT NOT NULL,
-                    metadata TEXT,
+                    metadata BLOB,
                     start_pos INTEGER,
                     end_pos INTEGER,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -228,12 +228,9 @@ class AsyncVectorStore:
                 async with conn.execute(query, chunk_ids) as cursor:
                     results = []
                     async for row in cursor:
-                        chunk_id, source_file, content, metadata_json, start_pos, end_pos = row
+                        chunk_id, source_file, content, metadata_raw, start_pos, end_pos = row
                         
-                        try:
-                            metadata = json.loads(metadata_json) if metadata_json else {}
-                        except json.JSONDecodeError:
-                            metadata = {}
+                        metadata = unpack_metadata(metadata_raw)
                         
                         results.append({
                             'chunk_id': chunk_id,
@@ -281,7 +278,7 @@ class AsyncVectorStore:
                         chunk.chunk_id,
                         chunk.source_file,
                         chunk.content,
-                        json.dumps(chunk.metadata),
+                        pack_metadata(chunk.metadata),
                         chunk.start_pos,
                         chunk.end_pos
                     )
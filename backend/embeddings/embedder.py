@@ -2,6 +2,8 @@
 Embedding model wrapper for generating text embeddings
 """
 import logging
+import math
+import functools
 from typing import List, Union, Optional
 import numpy as np
 from pathlib import Path
@@ -13,19 +15,28 @@ class EmbeddingModel:
     Wrapper for embedding models (sentence-transformers, OpenAI, etc.)
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = "cpu",
+                 precision: str = "fp32", query_cache_size: int = 1024):
         """
         Initialize the embedding model
         
         Args:
             model_name: Name of the model to use
             device: Device to run the model on ("cpu" or "cuda")
+            precision: "fp32", or "int8" for dynamically quantized Linear
+                layers on CPU (fp16 on CUDA); falls back to fp32 on failure
+            query_cache_size: Number of query embeddings kept in an LRU cache
         """
         self.model_name = model_name
         self.device = device
+        self.precision = precision
         self.model = None
         self.embedding_dim: int = 384  # Set default dimension
         
+        # Query embeddings keyed by whitespace-normalized text, so repeated
+        # questions skip the model entirely
+        self._embed_query_cached = functools.lru_cache(maxsize=query_cache_size)(self._embed_query_uncached)
+        
         # Initialize model (will be implemented when dependencies are added)
         self._load_model()
     
@@ -40,6 +51,9 @@ class EmbeddingModel:
             dimension = self.model.get_sentence_embedding_dimension()
             self.embedding_dim = int(dimension) if dimension is not None else 384
             
+            if self.precision != "fp32":
+                self._quantize_model()
+            
             logger.info(f"Embedding model '{self.model_name}' loaded successfully with dimension {self.embedding_dim}")
             
         except ImportError:
@@ -52,6 +66,29 @@ class EmbeddingModel:
             self.model = None
             self.embedding_dim = 384
     
+    def _quantize_model(self):
+        """Reduce model precision in place, keeping fp32 weights if that fails"""
+        try:
+            import torch
+            
+            if self.device.startswith("cuda"):
+                # Dynamic int8 kernels are CPU-only; half precision is the GPU analogue
+                self.model.half()
+                self.precision = "fp16"
+            else:
+                # Weights stored as int8, activations quantized per batch, so
+                # the Linear matmuls run on VNNI/AMX int8 paths where available
+                torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+                self.precision = "int8"
+            
+            logger.info(f"Embedding model quantized to {self.precision}")
+            
+        except Exception as e:
+            logger.warning(f"Model quantization failed, using fp32: {str(e)}")
+            self.precision = "fp32"
+    
     def embed_text(self, text: Union[str, List[str]]) -> Union[np.ndarray, List[np.ndarray]]:
         """
         Generate embeddings for text(s)
@@ -95,10 +132,16 @@ class EmbeddingModel:
             query: Search query string
             
         Returns:
-            Numpy array embedding
+            Numpy array embedding (read-only; shared with the query cache)
         """
+        return self._embed_query_cached(" ".join(query.split()))
+    
+    def _embed_query_uncached(self, query: str) -> np.ndarray:
+        """Embed a normalized query behind the LRU cache"""
         embedding = self.embed_text(query)
-        return embedding[0] if isinstance(embedding, list) else embedding
+        embedding = embedding[0] if isinstance(embedding, list) else embedding
+        embedding.setflags(write=False)
+        return embedding
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings produced by this model"""
@@ -149,15 +192,13 @@ class EmbeddingModel:
         """
         try:
             # Cosine similarity calculation
-            dot_product = np.dot(embedding1, embedding2)
-            norm1 = np.linalg.norm(embedding1)
-            norm2 = np.linalg.norm(embedding2)
+            dot_product = float(np.vdot(embedding1, embedding2))
+            denominator_sq = float(np.vdot(embedding1, embedding1)) * float(np.vdot(embedding2, embedding2))
             
-            if norm1 == 0 or norm2 == 0:
+            if denominator_sq <= 0:
                 return 0.0
             
-            similarity = dot_product / (norm1 * norm2)
-            return float(similarity)
+            return dot_product / math.sqrt(denominator_sq)
             
         except Exception as e:
             logger.error(f"Similarity calculation failed: {str(e)}")
@@ -2,37 +2,175 @@
 Vector store for embedding storage and similarity search
 """
 import logging
-import sqlite3
 import json
 import numpy as np
 from typing import List, Dict, Any, Tuple, Optional
 from pathlib import Path
+import functools
 from dataclasses import asdict
 import pickle
+import struct
+import os
 import threading
 import contextlib
+from collections import Counter
 
 from embeddings.chunker import TextChunk
+from embeddings._metadata import pack_metadata, unpack_metadata, migrate_metadata
 from utils.resource_manager import get_database_pool, ResourceManager
 
+# Optional SIMD cosine kernels; NumPy matmul is used when unavailable
+try:
+    import simsimd
+    _HAVE_SIMSIMD = True
+except ImportError:
+    simsimd = None
+    _HAVE_SIMSIMD = False
+
+# Optional approximate nearest neighbour index; exact matmul scan otherwise
+try:
+    import faiss
+    _HAVE_FAISS = True
+except ImportError:
+    faiss = None
+    _HAVE_FAISS = False
+
+# Cross-process locking of the vector files; msvcrt on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 logger = logging.getLogger(__name__)
 
+# vectors.bin layout: header (magic, dim, dtype code) followed by raw
+# float32 rows, so new rows can be appended without rewriting the file
+_VECTOR_MAGIC = b"PTAHVEC1"
+_VECTOR_HEADER = struct.Struct("<8sII")
+_DTYPE_FLOAT32 = 0
+
+# Byte alignment of in-memory vector buffers (one cache line, AVX-512 width)
+_ALIGNMENT = 64
+
+# Rows sampled to train the HNSW scalar quantizer's per-dimension ranges
+_ANN_TRAIN_SAMPLE = 10000
+
+def _lock_file(f):
+    """Block until this process holds an exclusive lock on an open file"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after about ten seconds; keep waiting
+            continue
+
+def _unlock_file(f):
+    """Release a lock taken by _lock_file"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _normalize_rows(rows: np.ndarray) -> np.ndarray:
+    """Scale rows to unit L2 norm; zero rows stay zero"""
+    # einsum sums squares in one pass without materializing rows ** 2
+    norms = np.sqrt(np.einsum('ij,ij->i', rows, rows))[:, None]
+    norms[norms == 0] = 1.0
+    return (rows / norms).astype(np.float32, copy=False)
+
+def _aligned_empty(rows: int, dim: int, dtype=np.float32) -> np.ndarray:
+    """Uninitialized C-contiguous (rows, dim) array starting on a 64-byte boundary"""
+    dtype = np.dtype(dtype)
+    nbytes = rows * dim * dtype.itemsize
+    raw = np.empty(nbytes + _ALIGNMENT, dtype=np.uint8)
+    offset = -raw.ctypes.data % _ALIGNMENT
+    return raw[offset:offset + nbytes].view(dtype).reshape(rows, dim)
+
+def _aligned_copy(rows: np.ndarray) -> np.ndarray:
+    """Copy a 2-D array into a fresh 64-byte aligned buffer"""
+    aligned = _aligned_empty(rows.shape[0], rows.shape[1], rows.dtype)
+    aligned[:] = rows
+    return aligned
+
+def _append_rows(buffer: np.ndarray, used: int,
+                 block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Write block after the first `used` rows of a capacity buffer, doubling
+    the (aligned) buffer when it is full so appends amortize to O(1)
+    
+    Returns:
+        (buffer, view of the used rows)
+    """
+    needed = used + block.shape[0]
+    if buffer.shape[0] < needed or buffer.shape[1] != block.shape[1]:
+        capacity = max(needed, 2 * buffer.shape[0], 64)
+        grown = _aligned_empty(capacity, block.shape[1], block.dtype)
+        if used:
+            grown[:used] = buffer[:used]
+        buffer = grown
+    buffer[used:needed] = block
+    return buffer, buffer[:needed]
+
+def _quantize_rows(rows: np.ndarray) -> np.ndarray:
+    """Symmetric per-row int8 quantization (scale = max(|v|) / 127)"""
+    scales = np.abs(rows).max(axis=1, keepdims=True) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(rows / scales).astype(np.int8)
+
 class VectorStore:
     """
     Vector database for storing and searching document embeddings
     Uses connection pooling and proper resource management
     """
     
-    def __init__(self, db_path: str = "data/corpus.db", vector_path: str = "data/vectors.pkl"):
+    def __init__(self, db_path: str = "data/corpus.db", vector_path: str = "data/vectors.bin",
+                 quantize: bool = False, index_type: str = "flat",
+                 hnsw_m: int = 32, ef_construction: int = 64, ef_search: Optional[int] = None,
+                 ann_quantization: str = "flat"):
         """
         Initialize the vector store
         
         Args:
             db_path: Path to SQLite database for metadata
-            vector_path: Path to pickle file for vector storage
+            vector_path: Path to the append-only vector file; chunk ids are
+                journaled alongside it in <stem>_ids.jsonl
+            quantize: Scan an int8 copy of the vectors during search (needs simsimd)
+            index_type: "flat" for an exact scan, "hnsw" for a FAISS HNSW graph
+                (needs faiss); filtered searches always scan exactly
+            hnsw_m: HNSW graph degree
+            ef_construction: HNSW build-time candidate list size
+            ef_search: HNSW query-time candidate list size; defaults to
+                max(40, 4 * k) per search and may be changed at runtime
+            ann_quantization: "flat" keeps float32 vectors in the HNSW graph;
+                "sq8" stores them as 8-bit scalar-quantized codes (a quarter
+                of the memory, slightly lower recall)
         """
         self.db_path = Path(db_path)
         self.vector_path = Path(vector_path)
+        self.ids_path = self.vector_path.with_name(f"{self.vector_path.stem}_ids.jsonl")
+        self.legacy_npy_path = self.vector_path.with_suffix('.npy')
+        self.legacy_vector_path = self.vector_path.with_suffix('.pkl')
+        self.ann_path = self.vector_path.with_suffix('.hnsw')
+        self.lock_path = self.vector_path.with_suffix('.lock')
+        self.quantize = quantize and _HAVE_SIMSIMD
+        if quantize and not _HAVE_SIMSIMD:
+            logger.warning("simsimd not installed, int8 quantized search disabled")
+        self.use_ann = index_type == "hnsw" and _HAVE_FAISS
+        if index_type == "hnsw" and not _HAVE_FAISS:
+            logger.warning("faiss not installed, falling back to exact search")
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        if ann_quantization not in ("flat", "sq8"):
+            raise ValueError(f"Unknown ann_quantization: {ann_quantization}")
+        self.ann_quantization = ann_quantization
         
         # Create directories if they don't exist
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
@@ -41,24 +179,79 @@ class VectorStore:
         # Get database pool for connection management
         self.db_pool = get_database_pool(str(self.db_path), max_connections=5)
         
-        # Thread-safe vector storage
-        self.vectors = {}  # chunk_id -> np.ndarray
+        # Thread-safe vector storage, row-aligned: _ids[i] owns _matrix[i]
+        # and, when quantizing, _matrix_i8[i]. Rows of _matrix are kept
+        # L2-normalized so cosine similarity is a plain inner product.
+        # Tombstoned rows have a None id and a zero vector until compaction.
+        # Both matrices are views over 64-byte aligned buffers with spare
+        # capacity (_matrix_buf / _matrix_i8_buf) that double when full;
+        # a freshly loaded file stays memory-mapped until the first append.
+        # _needs_full_save is set whenever the on-disk files can no longer be
+        # brought up to date by appending (first write, compaction, clear).
+        self._ids: List[Optional[str]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._matrix = self._matrix_buf = np.empty((0, 0), dtype=np.float32)
+        self._matrix_i8 = self._matrix_i8_buf = np.empty((0, 0), dtype=np.int8)
+        self._dead_rows: List[int] = []
+        self._needs_full_save = True
         self._vector_lock = threading.RLock()
         
+        # Other VectorStore instances (per request, or in other processes)
+        # append to the same files, so every mutation runs under an exclusive
+        # lock on <stem>.lock and first reloads if the files changed since
+        # this instance last read or wrote them. _disk_state is (inode, size,
+        # mtime) of both files as of then; _file_lock_depth makes it re-entrant.
+        self._disk_state = None
+        self._file_lock_depth = 0
+        
+        # Chunk ids per source file so filtered searches only scan those rows;
+        # keyed by id rather than row so compaction doesn't invalidate it.
+        # Built from the chunks table on the first filtered search (None until
+        # then), since most stores are built per request and never filter.
+        # Resolved row arrays are cached until the next vector mutation.
+        self._file_chunk_ids: Optional[Dict[str, set]] = None
+        self._file_rows: Dict[str, np.ndarray] = {}
+        self._file_rows_version = -1
+        
+        # HNSW graph over the rows of _matrix (FAISS id == row). Graphs can't
+        # update or renumber rows, so overwrites and compaction drop it (and
+        # its file) for a lazy rebuild; appends are added incrementally and a
+        # saved graph that lags the vector file just gets its tail re-added.
+        self._ann = None
+        self._ann_saved_rows = 0
+        # Rows the sq8 quantizer ranges were fitted on; a graph trained on a
+        # small first batch is rebuilt once the corpus has doubled past it
+        self._ann_trained_rows = 0
+        
+        # Top-K results keyed by (normalized query bytes, limit, threshold,
+        # matrix version); any vector mutation bumps the version so stale
+        # entries are never hit and age out of the LRU
+        self._matrix_version = 0
+        self._search_cached = functools.lru_cache(maxsize=256)(self._search_uncached)
+        
         # Initialize storage
         self._init_database()
-        self._load_vectors()
+        with self._locked_files(sync=False):
+            self._load_vectors()
+        if self.use_ann:
+            self._load_ann()
     
     def _init_database(self):
         """Initialize the SQLite database schema"""
         try:
             with self.db_pool.get_connection() as conn:
+                # WAL is persisted in the database file, so readers that open
+                # their own connections don't block on writers either
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA temp_store=MEMORY")
+                
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS chunks (
                         chunk_id TEXT PRIMARY KEY,
                         source_file TEXT NOT NULL,
                         content TEXT NOT NULL,
-                        metadata TEXT,
+                        metadata BLOB,
                         start_pos INTEGER,
                         end_pos INTEGER,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -79,6 +272,11 @@ class VectorStore:
                     CREATE INDEX IF NOT EXISTS idx_chunks_source_file 
                     ON chunks(source_file)
                 """)
+                
+                # Convert JSON TEXT metadata to msgpack BLOBs, once per database
+                migrated = migrate_metadata(conn)
+                if migrated:
+                    logger.info(f"Converted metadata of {migrated} chunks to msgpack")
                 conn.commit()
                 logger.info("Database initialized successfully")
                 
@@ -86,41 +284,525 @@ class VectorStore:
             logger.error(f"Database initialization failed: {str(e)}")
             raise
     
+    def _current_disk_state(self) -> Tuple:
+        """(inode, size, mtime) of the vector file and id journal, None if missing"""
+        state = []
+        for path in (self.vector_path, self.ids_path):
+            try:
+                st = path.stat()
+                state.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+    
+    @contextlib.contextmanager
+    def _locked_files(self, sync: bool = True):
+        """
+        Hold the vector lock and an exclusive lock on the vector files
+        
+        Args:
+            sync: Reload first if another instance changed the files
+        """
+        with self._vector_lock:
+            if self._file_lock_depth:
+                self._file_lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._file_lock_depth -= 1
+                return
+            
+            with open(self.lock_path, 'a+b') as lock_file:
+                _lock_file(lock_file)
+                self._file_lock_depth = 1
+                try:
+                    if sync and self._current_disk_state() != self._disk_state:
+                        logger.info("Vector files changed on disk, reloading")
+                        self._load_vectors()
+                        if self.use_ann:
+                            self._load_ann()
+                    yield
+                finally:
+                    self._file_lock_depth = 0
+                    _unlock_file(lock_file)
+    
+    def _reset_vectors(self):
+        """Drop all in-memory vectors"""
+        self._matrix_version += 1
+        self._needs_full_save = True
+        self._ids = []
+        self._id_to_row = {}
+        self._matrix = self._matrix_buf = np.empty((0, 0), dtype=np.float32)
+        self._matrix_i8 = self._matrix_i8_buf = np.empty((0, 0), dtype=np.int8)
+        self._dead_rows = []
+        self._file_chunk_ids = None
+        self._ann = None
+        self._ann_saved_rows = 0
+    
+    def _load_file_index(self):
+        """Build the source file -> chunk ids index from the chunks table"""
+        try:
+            with self.db_pool.get_connection() as conn:
+                cursor = conn.execute("SELECT chunk_id, source_file FROM chunks")
+                file_chunk_ids: Dict[str, set] = {}
+                for chunk_id, source_file in cursor:
+                    file_chunk_ids.setdefault(source_file, set()).add(chunk_id)
+            
+            with self._vector_lock:
+                self._file_chunk_ids = file_chunk_ids
+                
+        except Exception as e:
+            logger.error(f"Failed to load file index: {str(e)}")
+    
+    def _rows_for_files(self, file_filter: List[str]) -> np.ndarray:
+        """Live matrix rows belonging to the given source files (caller holds the lock)"""
+        if self._file_chunk_ids is None:
+            self._load_file_index()
+        file_chunk_ids = self._file_chunk_ids or {}
+        
+        if self._file_rows_version != self._matrix_version:
+            self._file_rows = {}
+            self._file_rows_version = self._matrix_version
+        
+        blocks = []
+        for source_file in dict.fromkeys(file_filter):
+            rows = self._file_rows.get(source_file)
+            if rows is None:
+                rows = np.fromiter(
+                    (self._id_to_row[chunk_id]
+                     for chunk_id in file_chunk_ids.get(source_file, ())
+                     if chunk_id in self._id_to_row),
+                    dtype=np.intp
+                )
+                rows.sort()
+                self._file_rows[source_file] = rows
+            blocks.append(rows)
+        
+        if not blocks:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(blocks)
+    
+    def _set_vectors(self, chunk_ids: List[str],
+                     embeddings: List[np.ndarray]) -> Tuple[int, List[int]]:
+        """
+        Insert or overwrite rows for the given chunk ids
+        
+        Returns:
+            (first appended row, rows overwritten in place)
+        """
+        self._matrix_version += 1
+        first_new_row = len(self._ids)
+        if not chunk_ids:
+            return first_new_row, []
+        
+        # Normalize the whole batch at once; norm cost scales with the batch,
+        # never with the corpus already in the store
+        vectors = _normalize_rows(np.vstack([
+            np.asarray(embedding, dtype=np.float32).reshape(1, -1) for embedding in embeddings
+        ]))
+        if self._matrix.shape[1] and vectors.shape[1] != self._matrix.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match "
+                f"store dimension {self._matrix.shape[1]}"
+            )
+        
+        new_ids = []
+        new_sources = []  # batch index feeding each appended row
+        overwritten = {}  # existing row -> batch index
+        
+        for index, chunk_id in enumerate(chunk_ids):
+            row = self._id_to_row.get(chunk_id)
+            if row is None:
+                self._id_to_row[chunk_id] = first_new_row + len(new_ids)
+                new_ids.append(chunk_id)
+                new_sources.append(index)
+            elif row >= first_new_row:
+                # Repeated id within this batch; the last embedding wins
+                new_sources[row - first_new_row] = index
+            else:
+                overwritten[row] = index
+        
+        overwritten_rows = list(overwritten)
+        if overwritten_rows:
+            self._invalidate_ann()
+            updated = vectors[list(overwritten.values())]
+            self._matrix[overwritten_rows] = updated
+            if self.quantize:
+                self._matrix_i8[overwritten_rows] = _quantize_rows(updated)
+        
+        if new_ids:
+            block = vectors[new_sources]
+            self._matrix_buf, self._matrix = _append_rows(self._matrix_buf, first_new_row, block)
+            if self.quantize:
+                self._matrix_i8_buf, self._matrix_i8 = _append_rows(
+                    self._matrix_i8_buf, first_new_row, _quantize_rows(block)
+                )
+            self._ids.extend(new_ids)
+            self._ann_append(first_new_row)
+        
+        return first_new_row, overwritten_rows
+    
+    def _remove_vectors(self, chunk_ids: List[str]) -> List[int]:
+        """
+        Tombstone rows for the given chunk ids, compacting when they pile up
+        
+        Returns:
+            Rows tombstoned (meaningless if compaction ran; a full save follows)
+        """
+        self._matrix_version += 1
+        tombstoned_rows = []
+        for chunk_id in chunk_ids:
+            row = self._id_to_row.pop(chunk_id, None)
+            if row is not None:
+                self._ids[row] = None
+                self._matrix[row] = 0.0
+                if self.quantize:
+                    self._matrix_i8[row] = 0
+                self._dead_rows.append(row)
+                tombstoned_rows.append(row)
+        
+        if len(self._dead_rows) > max(64, len(self._ids) // 4):
+            self._compact_vectors()
+        
+        return tombstoned_rows
+    
+    def _compact_vectors(self):
+        """Drop tombstoned rows and rebuild the id index"""
+        live_rows = [row for row, chunk_id in enumerate(self._ids) if chunk_id is not None]
+        self._matrix = self._matrix_buf = _aligned_copy(self._matrix[live_rows])
+        if self.quantize:
+            self._matrix_i8 = self._matrix_i8_buf = _aligned_copy(self._matrix_i8[live_rows])
+        self._ids = [self._ids[row] for row in live_rows]
+        self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._dead_rows = []
+        self._needs_full_save = True
+        self._invalidate_ann()
+        logger.debug(f"Compacted vector storage to {len(self._ids)} rows")
+    
+    def _adopt_vectors(self, ids: List[Optional[str]], matrix: np.ndarray):
+        """Take ownership of a row-aligned id list and matrix loaded from disk"""
+        self._matrix_version += 1
+        if not isinstance(matrix, np.memmap):
+            matrix = _aligned_copy(np.asarray(matrix, dtype=np.float32))
+        self._ids = ids
+        self._matrix = self._matrix_buf = matrix
+        self._id_to_row = {}
+        self._dead_rows = []
+        for row, chunk_id in enumerate(ids):
+            if chunk_id is None:
+                self._dead_rows.append(row)
+            else:
+                self._id_to_row[chunk_id] = row
+        if not self._is_normalized(matrix, ids):
+            logger.info("Legacy vector file detected, normalizing rows")
+            self._matrix = self._matrix_buf = matrix = _aligned_copy(_normalize_rows(np.asarray(matrix)))
+            self._needs_full_save = True
+            self._invalidate_ann()
+        if self.quantize:
+            self._matrix_i8 = self._matrix_i8_buf = _aligned_copy(_quantize_rows(matrix))
+    
+    def _is_normalized(self, matrix: np.ndarray, ids: List[Optional[str]],
+                       sample_size: int = 8) -> bool:
+        """Check that a sample of live, non-zero rows has unit norm"""
+        sampled = 0
+        for row, chunk_id in enumerate(ids):
+            if chunk_id is None:
+                continue
+            norm = float(np.linalg.norm(matrix[row]))
+            if norm == 0:
+                continue
+            if abs(norm - 1.0) > 1e-3:
+                return False
+            sampled += 1
+            if sampled >= sample_size:
+                break
+        return True
+    
+    def _read_vector_file(self) -> np.ndarray:
+        """Map vectors.bin copy-on-write; in-place row updates stay private"""
+        with open(self.vector_path, 'rb') as f:
+            header = f.read(_VECTOR_HEADER.size)
+        magic, dim, dtype_code = _VECTOR_HEADER.unpack(header)
+        if magic != _VECTOR_MAGIC or dtype_code != _DTYPE_FLOAT32:
+            raise ValueError(f"Unrecognized vector file format: {self.vector_path}")
+        
+        # Ignore a trailing partial row left by an interrupted append
+        data_size = self.vector_path.stat().st_size - _VECTOR_HEADER.size
+        row_count = data_size // (dim * 4) if dim else 0
+        if row_count == 0:
+            return np.empty((0, dim), dtype=np.float32)
+        
+        return np.memmap(self.vector_path, dtype=np.float32, mode='c',
+                         offset=_VECTOR_HEADER.size, shape=(row_count, dim))
+    
+    def _read_id_journal(self) -> List[Optional[str]]:
+        """Replay the id journal: a string appends a row, null a dead row,
+        {"tombstone": row} kills an earlier row"""
+        ids: List[Optional[str]] = []
+        with open(self.ids_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if isinstance(entry, dict):
+                    ids[entry['tombstone']] = None
+                else:
+                    ids.append(entry)
+        return ids
+    
     def _load_vectors(self):
-        """Load vectors from pickle file with proper error handling"""
+        """Load vectors from the append-only vector file and id journal"""
         with self._vector_lock:
             try:
-                if self.vector_path.exists():
-                    with open(self.vector_path, 'rb') as f:
-                        self.vectors = pickle.load(f)
-                    logger.info(f"Loaded {len(self.vectors)} vectors from storage")
+                self._reset_vectors()
+                if self.vector_path.exists() and self.ids_path.exists():
+                    matrix = self._read_vector_file()
+                    ids = self._read_id_journal()
+                    
+                    consistent = matrix.shape[0] == len(ids)
+                    if not consistent:
+                        logger.warning(
+                            f"Vector file has {matrix.shape[0]} rows but id journal has "
+                            f"{len(ids)} ids, truncating to the shorter"
+                        )
+                        row_count = min(matrix.shape[0], len(ids))
+                        matrix, ids = matrix[:row_count], ids[:row_count]
+                    
+                    # Appends can continue unless adopting found something to rewrite
+                    self._needs_full_save = False
+                    self._adopt_vectors(ids, matrix)
+                    if not consistent:
+                        self._needs_full_save = True
+                    logger.info(f"Loaded {len(self._id_to_row)} vectors from storage")
+                elif self.legacy_npy_path.exists() and self.ids_path.exists():
+                    self._adopt_vectors(self._read_id_journal(), np.load(self.legacy_npy_path))
+                    self._save_vectors()
+                    logger.info(f"Migrated {len(self._id_to_row)} vectors from {self.legacy_npy_path}")
+                elif self.legacy_vector_path.exists():
+                    self._load_legacy_vectors()
                 else:
-                    self.vectors = {}
                     logger.info("No existing vectors found, starting fresh")
                     
             except Exception as e:
                 logger.error(f"Failed to load vectors: {str(e)}")
-                self.vectors = {}
+                self._reset_vectors()
+            finally:
+                self._disk_state = self._current_disk_state()
+    
+    def _load_legacy_vectors(self):
+        """Migrate a pickled chunk_id -> ndarray dict to the append-only layout"""
+        with open(self.legacy_vector_path, 'rb') as f:
+            stored = pickle.load(f)
+        self._set_vectors(list(stored.keys()), list(stored.values()))
+        self._save_vectors()
+        logger.info(f"Migrated {len(self._ids)} vectors from {self.legacy_vector_path}")
     
     def _save_vectors(self):
-        """Save vectors to pickle file with atomic writes"""
-        with self._vector_lock:
+        """Rewrite the vector file and id journal from scratch, atomically"""
+        with self._locked_files(sync=False):
+            temp_matrix_path = self.vector_path.with_suffix('.bin.tmp')
+            temp_ids_path = self.ids_path.with_suffix('.tmp')
             try:
-                # Write to temporary file first for atomic operation
-                temp_path = self.vector_path.with_suffix('.tmp')
-                with open(temp_path, 'wb') as f:
-                    pickle.dump(self.vectors, f)
+                matrix = self._matrix
+                if isinstance(matrix, np.memmap):
+                    # Don't hold a mapping of the file we are about to replace
+                    matrix = _aligned_copy(matrix)
+                    self._matrix = self._matrix_buf = matrix
+                
+                # Write to temporary files first for atomic operation
+                with open(temp_matrix_path, 'wb') as f:
+                    f.write(_VECTOR_HEADER.pack(_VECTOR_MAGIC, matrix.shape[1], _DTYPE_FLOAT32))
+                    f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+                with open(temp_ids_path, 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(chunk_id) + "\n" for chunk_id in self._ids)
+                
+                # Atomic renames
+                temp_matrix_path.replace(self.vector_path)
+                temp_ids_path.replace(self.ids_path)
                 
-                # Atomic rename
-                temp_path.replace(self.vector_path)
+                # An empty store has no dimension yet, so the next write
+                # must rewrite the header as well
+                self._needs_full_save = matrix.shape[1] == 0
+                self._disk_state = self._current_disk_state()
                 logger.debug("Vectors saved to storage")
                 
             except Exception as e:
                 logger.error(f"Failed to save vectors: {str(e)}")
-                # Clean up temp file if it exists
-                temp_path = self.vector_path.with_suffix('.tmp')
-                if temp_path.exists():
-                    temp_path.unlink()
+                # Clean up temp files if they exist
+                for temp_path in (temp_matrix_path, temp_ids_path):
+                    if temp_path.exists():
+                        temp_path.unlink()
+    
+    def _persist_changes(self, first_new_row: int, overwritten_rows: List[int] = (),
+                         tombstoned_rows: List[int] = ()):
+        """
+        Bring the on-disk files up to date by writing only what changed:
+        overwritten rows in place, new rows appended, tombstones journaled
+        
+        Callers hold _locked_files from before the change was made, so the
+        files hold exactly the rows this instance had before it.
+        """
+        with self._locked_files(sync=False):
+            if self._needs_full_save or not self.vector_path.exists() or not self.ids_path.exists():
+                self._save_vectors()
+                return
+            
+            try:
+                row_bytes = self._matrix.shape[1] * 4
+                with open(self.vector_path, 'r+b') as f:
+                    # Count the rows actually in the file rather than trusting
+                    # our own view; a partial row left by an interrupted
+                    # append doesn't count and is overwritten below
+                    disk_rows = (f.seek(0, os.SEEK_END) - _VECTOR_HEADER.size) // row_bytes
+                    if disk_rows != first_new_row:
+                        raise ValueError(f"vector file has {disk_rows} rows, expected {first_new_row}")
+                    
+                    for row in overwritten_rows:
+                        f.seek(_VECTOR_HEADER.size + row * row_bytes)
+                        f.write(self._matrix[row].tobytes())
+                    
+                    f.seek(_VECTOR_HEADER.size + disk_rows * row_bytes)
+                    f.write(np.ascontiguousarray(self._matrix[first_new_row:]).tobytes())
+                    f.truncate()
+                
+                with open(self.ids_path, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(chunk_id) + "\n" for chunk_id in self._ids[first_new_row:])
+                    f.writelines(json.dumps({"tombstone": row}) + "\n" for row in tombstoned_rows)
+                
+                self._disk_state = self._current_disk_state()
+                logger.debug(f"Appended {len(self._ids) - first_new_row} vectors to storage")
+                
+            except Exception as e:
+                logger.error(f"Failed to append vectors, rewriting storage: {str(e)}")
+                self._save_vectors()
+    
+    def _invalidate_ann(self):
+        """Drop the HNSW graph (and its file) after rows were rewritten or renumbered"""
+        self._ann = None
+        self._ann_saved_rows = 0
+        try:
+            if self.ann_path.exists():
+                self.ann_path.unlink()
+        except OSError as e:
+            logger.warning(f"Failed to remove stale HNSW index: {str(e)}")
+    
+    def _new_ann(self, dim: int):
+        """Empty HNSW index of the configured storage type"""
+        if self.ann_quantization == "sq8":
+            return faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, self.hnsw_m,
+                                     faiss.METRIC_INNER_PRODUCT)
+        return faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+    
+    def _ann_add(self, vectors: np.ndarray):
+        """Add rows to the graph, training the quantizer on the first batch"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(vectors):
+            return
+        if not self._ann.is_trained:
+            # Per-dimension ranges only need a sample; vectors are unit
+            # length so later rows rarely fall outside the trained range
+            sample = vectors
+            if len(vectors) > _ANN_TRAIN_SAMPLE:
+                picks = np.random.default_rng(0).choice(len(vectors), _ANN_TRAIN_SAMPLE, replace=False)
+                sample = vectors[np.sort(picks)]
+            self._ann.train(sample)
+            self._ann_trained_rows = len(sample)
+        self._ann.add(vectors)
+    
+    def _build_ann(self):
+        """Build the HNSW graph from every row of the matrix"""
+        dim = self._matrix.shape[1]
+        index = self._new_ann(dim)
+        index.hnsw.efConstruction = self.ef_construction
+        self._ann = index
+        self._ann_add(self._matrix)
+        logger.info(f"Built HNSW index over {index.ntotal} vectors")
+        self._save_ann()
+    
+    def _ann_append(self, first_new_row: int):
+        """Add freshly appended rows to the graph, if one is built and in step"""
+        if self._ann is None:
+            return
+        if self._ann.ntotal != first_new_row:
+            self._ann = None
+            return
+        if (self.ann_quantization == "sq8" and self._ann_trained_rows < _ANN_TRAIN_SAMPLE
+                and len(self._ids) >= 2 * self._ann_trained_rows):
+            # Rebuild lazily so the quantizer is refitted on a larger sample
+            self._ann = None
+            return
+        self._ann_add(self._matrix[first_new_row:])
+        
+        # Rewriting the graph on every ingest would undo the append-only
+        # vector file; save once it has grown by a tenth since the last write
+        if self._ann.ntotal - self._ann_saved_rows >= max(1024, self._ann_saved_rows // 10):
+            self._save_ann()
+    
+    def _save_ann(self):
+        """Write the graph atomically; rows missing from the file are re-added on load"""
+        temp_path = self.ann_path.with_suffix('.hnsw.tmp')
+        try:
+            faiss.write_index(self._ann, str(temp_path))
+            temp_path.replace(self.ann_path)
+            self._ann_saved_rows = self._ann.ntotal
+        except Exception as e:
+            logger.error(f"Failed to save HNSW index: {str(e)}")
+            if temp_path.exists():
+                temp_path.unlink()
+    
+    def _load_ann(self):
+        """Load a saved graph and catch it up with rows appended since it was written"""
+        if not self.ann_path.exists():
+            return
+        
+        with self._vector_lock:
+            try:
+                index = faiss.read_index(str(self.ann_path))
+                stored_sq8 = isinstance(index, faiss.IndexHNSWSQ)
+                if (index.d != self._matrix.shape[1] or index.ntotal > len(self._ids)
+                        or stored_sq8 != (self.ann_quantization == "sq8")):
+                    logger.warning("Saved HNSW index does not match the vector file, rebuilding on demand")
+                    self._invalidate_ann()
+                    return
+                
+                self._ann = index
+                self._ann_saved_rows = index.ntotal
+                self._ann_trained_rows = index.ntotal
+                if index.ntotal < len(self._ids):
+                    self._ann_append(index.ntotal)
+                logger.info(f"Loaded HNSW index with {self._ann.ntotal} vectors")
+                
+            except Exception as e:
+                logger.error(f"Failed to load HNSW index: {str(e)}")
+                self._ann = None
+    
+    def _search_ann(self, queries: np.ndarray, limit: int,
+                    similarity_threshold: float) -> List[List[Tuple[str, float]]]:
+        """Approximate top-K for normalized float32 queries via the HNSW graph"""
+        with self._vector_lock:
+            if self._ann is None:
+                self._build_ann()
+            ids = self._ids
+            
+            # Tombstoned rows are still in the graph, so over-fetch to cover them
+            k = min(limit + len(self._dead_rows), self._ann.ntotal)
+            self._ann.hnsw.efSearch = self.ef_search or max(40, 4 * k)
+            scores, rows = self._ann.search(queries, k)
+        
+        results = []
+        for row_scores, row_ids in zip(scores.tolist(), rows.tolist()):
+            hits = []
+            for score, row in zip(row_scores, row_ids):
+                # Inner product of unit vectors is the cosine, best first
+                if row < 0 or score < similarity_threshold:
+                    break
+                chunk_id = ids[row]
+                if chunk_id is not None:
+                    hits.append((chunk_id, score))
+                    if len(hits) >= limit:
+                        break
+            results.append(hits)
+        return results
     
     def add_chunks(self, chunks: List[TextChunk], embeddings: List[np.ndarray]):
         """
@@ -135,40 +817,48 @@ class VectorStore:
         
         try:
             with self.db_pool.get_connection() as conn:
-                # Add chunks to database
-                chunk_data = []
-                for chunk in chunks:
-                    chunk_data.append((
+                # Add chunks to database, streaming rows rather than building a list
+                conn.executemany("""
+                    INSERT OR REPLACE INTO chunks 
+                    (chunk_id, source_file, content, metadata, start_pos, end_pos)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    (
                         chunk.chunk_id,
                         chunk.source_file,
                         chunk.content,
-                        json.dumps(chunk.metadata),
+                        pack_metadata(chunk.metadata),
                         chunk.start_pos,
                         chunk.end_pos
-                    ))
+                    )
+                    for chunk in chunks
+                ))
                 
+                # Update file chunk counts, one row per source file
+                file_counts = Counter(chunk.source_file for chunk in chunks)
                 conn.executemany("""
-                    INSERT OR REPLACE INTO chunks 
-                    (chunk_id, source_file, content, metadata, start_pos, end_pos)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, chunk_data)
-                
-                # Update file chunk count
-                for chunk in chunks:
-                    conn.execute("""
-                        INSERT OR REPLACE INTO files (filepath, filename, chunk_count)
-                        VALUES (?, ?, 
-                            COALESCE((SELECT chunk_count FROM files WHERE filepath = ?), 0) + 1)
-                    """, (chunk.source_file, Path(chunk.source_file).name, chunk.source_file))
+                    INSERT INTO files (filepath, filename, chunk_count)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(filepath) DO UPDATE
+                    SET chunk_count = chunk_count + excluded.chunk_count
+                """, (
+                    (source_file, Path(source_file).name, count)
+                    for source_file, count in file_counts.items()
+                ))
                 
                 conn.commit()
             
             # Add vectors to memory storage
-            for chunk, embedding in zip(chunks, embeddings):
-                self.vectors[chunk.chunk_id] = embedding
-            
-            # Save vectors to disk
-            self._save_vectors()
+            with self._locked_files():
+                first_new_row, overwritten_rows = self._set_vectors(
+                    [chunk.chunk_id for chunk in chunks], embeddings
+                )
+                if self._file_chunk_ids is not None:
+                    for chunk in chunks:
+                        self._file_chunk_ids.setdefault(chunk.source_file, set()).add(chunk.chunk_id)
+                
+                # Write only the new and changed rows to disk
+                self._persist_changes(first_new_row, overwritten_rows)
             
             logger.info(f"Added {len(chunks)} chunks to vector store")
             
@@ -177,7 +867,8 @@ class VectorStore:
             raise
     
     def search(self, query_embedding: np.ndarray, limit: int = 10, 
-               similarity_threshold: float = 0.0) -> List[Tuple[str, float]]:
+               similarity_threshold: float = 0.0,
+               file_filter: Optional[List[str]] = None) -> List[Tuple[str, float]]:
         """
         Search for similar chunks using cosine similarity
         
@@ -185,34 +876,119 @@ class VectorStore:
             query_embedding: Query embedding vector
             limit: Maximum number of results to return
             similarity_threshold: Minimum similarity score
+            file_filter: Only search chunks from these source files
             
         Returns:
             List of (chunk_id, similarity_score) tuples
         """
         try:
-            if not self.vectors:
-                logger.warning("No vectors in store for search")
-                return []
-            
-            similarities = []
-            
-            for chunk_id, embedding in self.vectors.items():
-                similarity = self._cosine_similarity(query_embedding, embedding)
-                
-                if similarity >= similarity_threshold:
-                    similarities.append((chunk_id, similarity))
-            
-            # Sort by similarity (descending) and limit results
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            results = similarities[:limit]
-            
-            logger.info(f"Search found {len(results)} results above threshold {similarity_threshold}")
-            return results
+            query = _normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
+            filter_key = tuple(sorted(set(file_filter))) if file_filter is not None else None
+            results = self._search_cached(
+                query.tobytes(), limit, similarity_threshold, self._matrix_version, filter_key
+            )
+            return list(results)
             
         except Exception as e:
             logger.error(f"Search failed: {str(e)}")
             return []
     
+    def _search_uncached(self, query_key: bytes, limit: int, similarity_threshold: float,
+                         matrix_version: int,
+                         file_filter: Optional[Tuple[str, ...]]) -> Tuple[Tuple[str, float], ...]:
+        """Single-query search behind the result cache; errors propagate uncached"""
+        query = np.frombuffer(query_key, dtype=np.float32).reshape(1, -1)
+        return tuple(self._search_batch(query, limit, similarity_threshold, file_filter)[0])
+    
+    def _search_batch(self, query_embeddings: np.ndarray, limit: int,
+                      similarity_threshold: float,
+                      file_filter: Optional[List[str]] = None) -> List[List[Tuple[str, float]]]:
+        """Score and select results for a (K, D) query matrix"""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        
+        if not self._id_to_row:
+            logger.warning("No vectors in store for search")
+            return [[] for _ in range(queries.shape[0])]
+        
+        if self.use_ann and file_filter is None and limit > 0:
+            results = self._search_ann(_normalize_rows(queries), limit, similarity_threshold)
+            logger.info(
+                f"HNSW search found {sum(len(r) for r in results)} results for "
+                f"{len(results)} queries above threshold {similarity_threshold}"
+            )
+            return results
+        
+        with self._vector_lock:
+            ids = self._ids
+            matrix = self._matrix_i8 if self.quantize else self._matrix
+            dead_rows = list(self._dead_rows)
+            
+            # Gather just the filtered files' rows; they are all live
+            if file_filter is not None:
+                rows = self._rows_for_files(file_filter)
+                matrix = np.take(matrix, rows, axis=0)
+                ids = [ids[row] for row in rows]
+                dead_rows = []
+        
+        if not ids:
+            return [[] for _ in range(queries.shape[0])]
+        
+        queries = _normalize_rows(queries)
+        if self.quantize:
+            queries = _quantize_rows(queries)
+        scores = self._score_rows(matrix, queries)
+        if dead_rows:
+            scores[:, dead_rows] = -np.inf
+        
+        results = [
+            self._select_top(ids, row_scores, limit, similarity_threshold)
+            for row_scores in scores
+        ]
+        
+        logger.info(
+            f"Search found {sum(len(r) for r in results)} results for {len(results)} "
+            f"queries above threshold {similarity_threshold}"
+        )
+        return results
+    
+    def _select_top(self, ids: List[Optional[str]], scores: np.ndarray, limit: int,
+                    similarity_threshold: float) -> List[Tuple[str, float]]:
+        """Pick the best rows at or above the threshold, best first"""
+        n = len(scores)
+        if limit <= 0 or n == 0:
+            return []
+        
+        # Partition the raw scores in place of masking first; the threshold is
+        # monotone so filtering the top rows afterwards gives the same result
+        # without gathering an N-length candidate array
+        if n > limit:
+            candidates = np.argpartition(scores, n - limit)[n - limit:]
+        else:
+            candidates = np.arange(n)
+        candidates = candidates[scores[candidates] >= similarity_threshold]
+        
+        # Sort only the selected rows by similarity (descending)
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(ids[row], float(scores[row])) for row in order]
+    
+    def _score_rows(self, matrix: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of normalized queries (K, D) against every normalized
+        row, returned as a (K, N) array
+        
+        matrix and queries may both be int8 (quantized) when simsimd is available;
+        cosine is scale-invariant so per-row quantization scales cancel out.
+        Zero rows score 0.0.
+        """
+        if _HAVE_SIMSIMD:
+            if matrix.dtype == np.int8:
+                distances = simsimd.cdist(queries, matrix, metric='cosine')
+                return 1.0 - np.asarray(distances, dtype=np.float32)
+            return np.asarray(simsimd.cdist(queries, matrix, metric='dot'), dtype=np.float32)
+        
+        # Rows are unit-length, so one matrix product is the cosine
+        return np.dot(queries, matrix.T)
+    
     def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a chunk by its ID
@@ -224,8 +1000,7 @@ class VectorStore:
             Dictionary with chunk data or None if not found
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.db_pool.get_connection() as conn:
                 cursor = conn.execute("""
                     SELECT * FROM chunks WHERE chunk_id = ?
                 """, (chunk_id,))
@@ -233,7 +1008,7 @@ class VectorStore:
                 row = cursor.fetchone()
                 if row:
                     result = dict(row)
-                    result['metadata'] = json.loads(result['metadata']) if result['metadata'] else {}
+                    result['metadata'] = unpack_metadata(result['metadata'])
                     return result
                 
                 return None
@@ -245,8 +1020,7 @@ class VectorStore:
     def get_file_chunks(self, filepath: str) -> List[Dict[str, Any]]:
         """Get all chunks for a specific file"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.db_pool.get_connection() as conn:
                 cursor = conn.execute("""
                     SELECT * FROM chunks WHERE source_file = ?
                     ORDER BY start_pos
@@ -255,7 +1029,7 @@ class VectorStore:
                 results = []
                 for row in cursor.fetchall():
                     result = dict(row)
-                    result['metadata'] = json.loads(result['metadata']) if result['metadata'] else {}
+                    result['metadata'] = unpack_metadata(result['metadata'])
                     results.append(result)
                 
                 return results
@@ -267,7 +1041,7 @@ class VectorStore:
     def file_exists(self, filepath: str) -> bool:
         """Check if a file already exists in the vector store"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_pool.get_connection() as conn:
                 cursor = conn.execute("SELECT 1 FROM files WHERE filepath = ?", (filepath,))
                 return cursor.fetchone() is not None
         except Exception as e:
@@ -277,7 +1051,7 @@ class VectorStore:
     def get_chunk_count(self) -> int:
         """Get total number of chunks in the store"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_pool.get_connection() as conn:
                 cursor = conn.execute("SELECT COUNT(*) FROM chunks")
                 return cursor.fetchone()[0]
         except Exception as e:
@@ -287,7 +1061,7 @@ class VectorStore:
     def get_file_list(self) -> List[str]:
         """Get list of all files in the store"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_pool.get_connection() as conn:
                 cursor = conn.execute("SELECT filepath FROM files")
                 return [row[0] for row in cursor.fetchall()]
         except Exception as e:
@@ -297,23 +1071,52 @@ class VectorStore:
     def get_chunk_metadata(self, chunk_id: str) -> Optional[Dict[str, Any]]:
         """Get metadata for a specific chunk"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.db_pool.get_connection() as conn:
                 cursor = conn.execute("SELECT * FROM chunks WHERE chunk_id = ?", (chunk_id,))
                 row = cursor.fetchone()
                 if row:
                     result = dict(row)
-                    result['metadata'] = json.loads(result['metadata']) if result['metadata'] else {}
+                    result['metadata'] = unpack_metadata(result['metadata'])
                     return result
                 return None
         except Exception as e:
             logger.error(f"Error getting chunk metadata: {str(e)}")
             return None
     
+    def get_chunks_metadata(self, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get metadata for several chunks in one query
+        
+        Args:
+            chunk_ids: Chunk ids to look up
+            
+        Returns:
+            Dictionary mapping each found chunk id to its chunk data
+        """
+        results = {}
+        try:
+            unique_ids = list(dict.fromkeys(chunk_ids))
+            with self.db_pool.get_connection() as conn:
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(unique_ids), 500):
+                    batch = unique_ids[start:start + 500]
+                    placeholders = ','.join('?' * len(batch))
+                    cursor = conn.execute(
+                        f"SELECT * FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                    )
+                    for row in cursor.fetchall():
+                        result = dict(row)
+                        result['metadata'] = unpack_metadata(result['metadata'])
+                        results[result['chunk_id']] = result
+            return results
+        except Exception as e:
+            logger.error(f"Error getting chunks metadata: {str(e)}")
+            return results
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector store"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_pool.get_connection() as conn:
                 # Get chunk count
                 cursor = conn.execute("SELECT COUNT(*) FROM chunks")
                 chunk_count = cursor.fetchone()[0]
@@ -336,7 +1139,7 @@ class VectorStore:
                 return {
                     "total_chunks": chunk_count,
                     "total_files": file_count,
-                    "vector_count": len(self.vectors),
+                    "vector_count": len(self._id_to_row),
                     "file_types": file_types
                 }
                 
@@ -344,43 +1147,62 @@ class VectorStore:
             logger.error(f"Failed to get stats: {str(e)}")
             return {}
     
-    def clear(self):
-        """Clear all data from the vector store"""
+    def delete_file(self, filepath: str) -> int:
+        """
+        Remove a file and all of its chunks from the store
+        
+        Args:
+            filepath: Source file path as stored in the chunks table
+            
+        Returns:
+            Number of chunks removed
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("DELETE FROM chunks")
-                conn.execute("DELETE FROM files")
+            with self.db_pool.get_connection() as conn:
+                cursor = conn.execute(
+                    "SELECT chunk_id FROM chunks WHERE source_file = ?", (filepath,)
+                )
+                chunk_ids = [row[0] for row in cursor.fetchall()]
+                conn.execute("DELETE FROM chunks WHERE source_file = ?", (filepath,))
+                conn.execute("DELETE FROM files WHERE filepath = ?", (filepath,))
                 conn.commit()
             
-            self.vectors.clear()
-            self._save_vectors()
+            with self._locked_files():
+                tombstoned_rows = self._remove_vectors(chunk_ids)
+                if self._file_chunk_ids is not None:
+                    self._file_chunk_ids.pop(filepath, None)
+                self._persist_changes(len(self._ids), tombstoned_rows=tombstoned_rows)
             
-            logger.info("Vector store cleared")
+            logger.info(f"Deleted {len(chunk_ids)} chunks for file {filepath}")
+            return len(chunk_ids)
             
         except Exception as e:
-            logger.error(f"Failed to clear vector store: {str(e)}")
+            logger.error(f"Failed to delete file {filepath}: {str(e)}")
             raise
     
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors"""
+    def clear(self):
+        """Clear all data from the vector store"""
         try:
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
+            with self.db_pool.get_connection() as conn:
+                conn.execute("DELETE FROM chunks")
+                conn.execute("DELETE FROM files")
+                conn.commit()
             
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
+            with self._locked_files(sync=False):
+                self._reset_vectors()
+                self._invalidate_ann()
+                self._save_vectors()
             
-            return float(dot_product / (norm1 * norm2))
+            logger.info("Vector store cleared")
             
         except Exception as e:
-            logger.error(f"Similarity calculation failed: {str(e)}")
-            return 0.0
+            logger.error(f"Failed to clear vector store: {str(e)}")
+            raise
     
     def get_files_list(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
         """Get paginated list of files with detailed information"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_pool.get_connection() as conn:
                 # Get total count first
                 cursor = conn.execute("SELECT COUNT(*) FROM files")
                 total_files = cursor.fetchone()[0]
@@ -421,7 +1243,7 @@ class VectorStore:
     def get_statistics(self) -> Dict[str, Any]:
         """Get comprehensive statistics about the vector store"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_pool.get_connection() as conn:
                 # Get chunk count
                 cursor = conn.execute("SELECT COUNT(*) FROM chunks")
                 chunk_count = cursor.fetchone()[0]
@@ -457,7 +1279,7 @@ class VectorStore:
                     "total_size_mb": total_size_mb,
                     "file_types": file_types,
                     "last_updated": last_updated,
-                    "vector_count": len(self.vectors)
+                    "vector_count": len(self._id_to_row)
                 }
                 
         except Exception as e:
@@ -3,13 +3,77 @@ Ollama integration for local LLM inference
 """
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from typing import List, Dict, Optional, Generator
+from typing import List, Dict, Optional, Generator, AsyncGenerator, Tuple
 from dataclasses import dataclass
 import time
+import functools
+
+# Optional async HTTP client for the async RAG paths, which otherwise
+# run the requests client in worker threads
+try:
+    import httpx
+    _HAVE_HTTPX = True
+except ImportError:
+    _HAVE_HTTPX = False
+
+# Optional fast JSON decoding for streamed chunks
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    _loads = json.loads
+    _dumps = None
+    _JSONDecodeError = json.JSONDecodeError
 
 logger = logging.getLogger(__name__)
 
+# Read size for streamed responses; the requests default is a single byte
+STREAM_CHUNK_SIZE = 65536
+
+# Rough chars-per-token ratio used to size num_keep without a tokenizer
+CHARS_PER_TOKEN = 4
+
+@functools.lru_cache(maxsize=32)
+def _system_fragment(system_prompt: str) -> Tuple[Dict[str, str], int]:
+    """Build the system message once per prompt along with its estimated token count"""
+    message = {"role": "system", "content": system_prompt}
+    return message, len(system_prompt) // CHARS_PER_TOKEN + 1
+
+def _prompt_messages(prompt: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+    """Build the message list for a single prompt with an optional system prompt"""
+    messages = []
+    
+    if system_prompt:
+        messages.append(_system_fragment(system_prompt)[0])
+    
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def _chat_payload(model: str, messages: List[Dict[str, str]], stream: bool,
+                  keep_alive: str, temperature: float = 0.7) -> Dict:
+    """Build an /api/chat payload, pinning a leading system prompt with num_keep"""
+    options = {
+        "temperature": temperature,
+        "top_p": 0.9,
+        "max_tokens": 2048
+    }
+    # Without a system prompt Ollama keeps its own num_keep default
+    if messages and messages[0].get('role') == 'system':
+        options["num_keep"] = _system_fragment(messages[0].get('content', ''))[1]
+    
+    return {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": keep_alive,
+        "options": options
+    }
+
 @dataclass
 class ChatMessage:
     """Chat message structure for Ollama"""
@@ -21,16 +85,32 @@ class OllamaClient:
     Client for interacting with Ollama API
     """
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2",
+                 keep_alive: str = "30m"):
         """
         Initialize Ollama client
           Args:
             base_url: Ollama API base URL
             model: Model name to use for inference
+            keep_alive: How long Ollama keeps the model (and its KV cache) loaded
         """
         self.base_url = base_url.rstrip('/')
         self.model = model
+        self.keep_alive = keep_alive
         self.session = requests.Session()
+        # Keep a warm connection pool so repeated calls reuse sockets
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Ollama is local, so skip gzip on responses
+        self.session.headers.update({
+            'Accept-Encoding': 'identity',
+            'Content-Type': 'application/json'
+        })
         # Configure default timeout for requests
         self.timeout = 60  # 60 second timeout
         
@@ -64,6 +144,13 @@ class OllamaClient:
             logger.error(f"Failed to connect to Ollama: {str(e)}")
             return False
     
+    def _post(self, endpoint: str, payload: Dict, **kwargs) -> requests.Response:
+        """POST a JSON payload, encoding it straight to bytes when orjson is available"""
+        url = f"{self.base_url}{endpoint}"
+        if _dumps is not None:
+            return self.session.post(url, data=_dumps(payload), **kwargs)
+        return self.session.post(url, json=payload, **kwargs)
+    
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """
         Generate a response from Ollama
@@ -76,29 +163,10 @@ class OllamaClient:
             Generated response text
         """
         try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            messages.append({"role": "user", "content": prompt})
-            
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 2048
-                }
-            }
+            messages = _prompt_messages(prompt, system_prompt)
+            payload = _chat_payload(self.model, messages, False, self.keep_alive)
             
-            response = self.session.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
+            response = self._post("/api/chat", payload)
             
             if response.status_code == 200:
                 result = response.json()
@@ -123,22 +191,9 @@ class OllamaClient:
             Assistant response
         """
         try:
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "stream": False,
-                "options": {
-                    "temperature": temperature,
-                    "top_p": 0.9,
-                    "max_tokens": 2048
-                }
-            }
+            payload = _chat_payload(self.model, messages, False, self.keep_alive, temperature)
             
-            response = self.session.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
+            response = self._post("/api/chat", payload)
             
             if response.status_code == 200:
                 result = response.json()
@@ -162,42 +217,34 @@ class OllamaClient:
         Yields:
             Response chunks as they're generated
         """
-        try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            messages.append({"role": "user", "content": prompt})
+        return self.stream_chat(_prompt_messages(prompt, system_prompt))
+    
+    def stream_chat(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> Generator[str, None, None]:
+        """
+        Chat with conversation history, streaming the reply
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Randomness in response (0.0 - 1.0)
             
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "stream": True,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 2048
-                }
-            }
+        Yields:
+            Response chunks as they're generated
+        """
+        try:
+            payload = _chat_payload(self.model, messages, True, self.keep_alive, temperature)
             
-            response = self.session.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                stream=True
-            )
+            response = self._post("/api/chat", payload, stream=True)
             
             if response.status_code == 200:
-                for line in response.iter_lines():
+                for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE):
                     if line:
                         try:
-                            chunk = json.loads(line.decode('utf-8'))
+                            chunk = _loads(line)
                             if 'message' in chunk and 'content' in chunk['message']:
                                 content = chunk['message']['content']
                                 if content:
                                     yield content
-                        except json.JSONDecodeError:
+                        except _JSONDecodeError:
                             continue
             else:
                 logger.error(f"Stream API error: {response.status_code}")
@@ -207,6 +254,22 @@ class OllamaClient:
             logger.error(f"Error in stream generation: {str(e)}")
             yield "Sorry, I'm having trouble connecting to the AI model."
     
+    def warm_up(self) -> bool:
+        """
+        Ask Ollama to load the model (an empty chat loads it without generating)
+        so the first real request doesn't pay the model load time
+        
+        Returns:
+            True if the model is loaded
+        """
+        try:
+            payload = {"model": self.model, "messages": [], "keep_alive": self.keep_alive}
+            response = self._post("/api/chat", payload, timeout=self.timeout)
+            return response.status_code == 200
+        except Exception as e:
+            logger.warning(f"Ollama warm-up failed: {str(e)}")
+            return False
+    
     def get_available_models(self) -> List[str]:
         """Get list of available models in Ollama"""
         try:
@@ -233,11 +296,7 @@ class OllamaClient:
         """
         try:
             payload = {"name": model_name}
-            response = self.session.post(
-                f"{self.base_url}/api/pull",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
+            response = self._post("/api/pull", payload)
             
             if response.status_code == 200:
                 logger.info(f"Successfully pulled model: {model_name}")
@@ -259,6 +318,129 @@ class OllamaClient:
             return False
 
 
+class OllamaAsyncClient:
+    """
+    Async client for the Ollama API built on httpx, used by the async RAG paths
+    so generation and streaming don't hold a worker thread per request
+    """
+    
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2",
+                 keep_alive: str = "30m", timeout: float = 60):
+        """
+        Initialize async Ollama client
+        
+        Args:
+            base_url: Ollama API base URL
+            model: Model name to use for inference
+            keep_alive: How long Ollama keeps the model (and its KV cache) loaded
+            timeout: Request timeout in seconds
+        """
+        if not _HAVE_HTTPX:
+            raise ImportError("httpx is required for OllamaAsyncClient (pip install httpx)")
+        
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.keep_alive = keep_alive
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            headers={
+                'Accept-Encoding': 'identity',
+                'Content-Type': 'application/json'
+            }
+        )
+    
+    async def aclose(self) -> None:
+        """Close the underlying connection pool"""
+        await self._client.aclose()
+    
+    def _request_kwargs(self, payload: Dict) -> Dict:
+        """Encode a payload for httpx, using orjson bytes when available"""
+        if _dumps is not None:
+            return {"content": _dumps(payload)}
+        return {"json": payload}
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Async counterpart of OllamaClient.generate"""
+        return await self.achat(_prompt_messages(prompt, system_prompt))
+    
+    async def achat(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        """
+        Chat with conversation history
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Randomness in response (0.0 - 1.0)
+            
+        Returns:
+            Assistant response
+        """
+        try:
+            payload = _chat_payload(self.model, messages, False, self.keep_alive, temperature)
+            
+            response = await self._client.post("/api/chat", **self._request_kwargs(payload))
+            
+            if response.status_code == 200:
+                result = _loads(response.content)
+                return result.get('message', {}).get('content', '')
+            else:
+                logger.error(f"Chat API error: {response.status_code} - {response.text}")
+                return "Sorry, I encountered an error during our conversation."
+                
+        except Exception as e:
+            logger.error(f"Error in chat: {str(e)}")
+            return "Sorry, I'm having trouble processing your message."
+    
+    def astream_generate(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """Async counterpart of OllamaClient.stream_generate"""
+        return self.astream_chat(_prompt_messages(prompt, system_prompt))
+    
+    async def astream_chat(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> AsyncGenerator[str, None]:
+        """
+        Chat with conversation history, streaming the reply
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Randomness in response (0.0 - 1.0)
+            
+        Yields:
+            Response chunks as they're generated
+        """
+        try:
+            payload = _chat_payload(self.model, messages, True, self.keep_alive, temperature)
+            
+            async with self._client.stream("POST", "/api/chat", **self._request_kwargs(payload)) as response:
+                if response.status_code != 200:
+                    logger.error(f"Stream API error: {response.status_code}")
+                    yield "Sorry, I encountered an error generating a response."
+                    return
+                
+                async for line in response.aiter_lines():
+                    if line:
+                        try:
+                            chunk = _loads(line)
+                            if 'message' in chunk and 'content' in chunk['message']:
+                                content = chunk['message']['content']
+                                if content:
+                                    yield content
+                        except _JSONDecodeError:
+                            continue
+                            
+        except Exception as e:
+            logger.error(f"Error in stream generation: {str(e)}")
+            yield "Sorry, I'm having trouble connecting to the AI model."
+    
+    async def awarm_up(self) -> bool:
+        """Async counterpart of OllamaClient.warm_up"""
+        try:
+            payload = {"model": self.model, "messages": [], "keep_alive": self.keep_alive}
+            response = await self._client.post("/api/chat", **self._request_kwargs(payload))
+            return response.status_code == 200
+        except Exception as e:
+            logger.warning(f"Ollama warm-up failed: {str(e)}")
+            return False
+
+
 class OllamaConfig:
     """Configuration for Ollama integration"""
     
@@ -269,6 +451,9 @@ class OllamaConfig:
         self.temperature = 0.7
         self.max_tokens = 2048
         self.timeout = 60
+        # Keeping the model loaded lets Ollama reuse the KV cache of the
+        # unchanged system prompt prefix across requests
+        self.keep_alive = "30m"
         
         # RAG-specific settings
         self.rag_system_prompt = """You are a helpful research assistant. You have access to a user's document corpus and can answer questions based on the provided context. 
@@ -283,3 +468,4 @@ When answering:
 Always be helpful, honest, and precise in your responses."""
         
         self.max_context_length = 4000  # Max chars for context injection
+        self.max_context_tokens = 1000  # Context budget in tokens when tiktoken is installed
@@ -2,17 +2,47 @@
 RAG (Retrieval-Augmented Generation) pipeline
 Combines document retrieval with Ollama LLM for contextual responses
 """
+import asyncio
+import functools
+import io
+import itertools
 import logging
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Generator, AsyncGenerator, Union, Sequence, Callable
 import time
 from dataclasses import dataclass
 
-from llm.ollama_client import OllamaClient, OllamaConfig
+from llm.ollama_client import OllamaClient, OllamaAsyncClient, OllamaConfig
 from embeddings.store import VectorStore
 from embeddings.embedder import EmbeddingModel
 
+# Optional tokenizer so the context budget is counted in tokens, not characters
+try:
+    import tiktoken
+    _HAVE_TIKTOKEN = True
+except ImportError:
+    tiktoken = None
+    _HAVE_TIKTOKEN = False
+
 logger = logging.getLogger(__name__)
 
+_CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+@functools.lru_cache(maxsize=128)
+def _render_history(messages: Tuple[Tuple[str, str], ...]) -> str:
+    """Render (role, content) pairs as the prompt's conversation block; cached
+    because consecutive turns re-render mostly the same messages"""
+    lines = ["Previous conversation:"]
+    lines.extend(f"{role.title()}: {content}" for role, content in messages if role and content)
+    lines.append("")
+    return "\n".join(lines)
+
+def _last_messages(chat_history: Sequence[Dict], count: int) -> List[Dict]:
+    """Last `count` messages in order; walks back from the end, so a
+    deque(maxlen=N) history is read without copying the whole thing"""
+    recent = list(itertools.islice(reversed(chat_history), count))
+    recent.reverse()
+    return recent
+
 @dataclass
 class RAGResult:
     """Result from RAG pipeline"""
@@ -30,7 +60,10 @@ class RAGPipeline:
     def __init__(self, 
                  ollama_base_url: str = "http://localhost:11434",
                  model_name: str = "llama3.2",
-                 vector_store_path: str = "data/corpus.db"):
+                 vector_store_path: str = "data/corpus.db",
+                 vector_index: str = "flat",
+                 embedder_precision: str = "fp32",
+                 quantization: str = "flat"):
         """
         Initialize RAG pipeline
         
@@ -38,21 +71,61 @@ class RAGPipeline:
             ollama_base_url: Ollama API URL
             model_name: Ollama model to use
             vector_store_path: Path to vector database
+            vector_index: "flat" for an exact scan, or "hnsw" for approximate
+                FAISS retrieval (opt-in; trades some recall for speed)
+            embedder_precision: Query embedder precision, "fp32" or "int8"; int8
+                trades some retrieval quality for speed, so it is opt-in
+            quantization: HNSW vector storage, "flat" for float32 or "sq8" for
+                8-bit codes (a quarter of the memory, lower recall)
         """
         self.config = OllamaConfig()
         self.config.base_url = ollama_base_url
         self.config.default_model = model_name
         
         # Initialize components
-        self.ollama = OllamaClient(ollama_base_url, model_name)
-        self.vector_store = VectorStore(db_path=vector_store_path)
-        self.embedder = EmbeddingModel()
+        self.ollama = OllamaClient(ollama_base_url, model_name, keep_alive=self.config.keep_alive)
+        try:
+            self.ollama_async = OllamaAsyncClient(ollama_base_url, model_name,
+                                                  keep_alive=self.config.keep_alive,
+                                                  timeout=self.config.timeout)
+        except ImportError:
+            # Without httpx the async paths run the sync client in worker threads
+            self.ollama_async = None
+        self.vector_store = VectorStore(db_path=vector_store_path, index_type=vector_index,
+                                        ann_quantization=quantization)
+        self.embedder = EmbeddingModel(precision=embedder_precision)
+        self._tokenizer = self._load_tokenizer()
         
         logger.info("RAG Pipeline initialized")
     
+    @staticmethod
+    def _load_tokenizer():
+        """BPE tokenizer for context budgeting, or None to budget by characters"""
+        if not _HAVE_TIKTOKEN:
+            return None
+        try:
+            # cl100k_base is not Llama's vocabulary but tracks its token
+            # counts far more closely than a character count does
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"Failed to load tokenizer, budgeting context by characters: {str(e)}")
+            return None
+    
+    def _context_budget(self) -> Tuple[int, Callable[[str], int], Callable[[str, int], str]]:
+        """Context budget with functions to measure text against it and clip text to it"""
+        tokenizer = self._tokenizer
+        if tokenizer is None:
+            return self.config.max_context_length, len, lambda text, size: text[:size]
+        
+        return (
+            self.config.max_context_tokens,
+            lambda text: len(tokenizer.encode(text)),
+            lambda text, size: tokenizer.decode(tokenizer.encode(text)[:size])
+        )
+    
     def query(self, 
               user_query: str,
-              chat_history: Optional[List[Dict]] = None,
+              chat_history: Optional[Sequence[Dict]] = None,
               max_sources: int = 5,
               similarity_threshold: float = 0.5,
               use_context: bool = True) -> RAGResult:
@@ -73,90 +146,308 @@ class RAGPipeline:
         
         try:
             # Step 1: Retrieve relevant documents
-            sources = []
-            context_text = ""
+            sources, context_text = [], ""
+            if use_context:
+                sources, context_text = self._retrieve(user_query, max_sources, similarity_threshold)
             
-            if use_context and self.vector_store.get_chunk_count() > 0:
-                logger.info(f"Retrieving context for query: '{user_query[:50]}...'")
-                
-                # Generate query embedding
-                query_embedding = self.embedder.embed_query(user_query)
-                
-                # Search for similar documents
-                similar_chunks = self.vector_store.search(
-                    query_embedding=query_embedding,
-                    limit=max_sources,
-                    similarity_threshold=similarity_threshold
+            # Step 2: Generate response with Ollama
+            response = self._generate(user_query, context_text, chat_history, use_context)
+            
+            return self._build_result(response, sources, context_text, start_time)
+            
+        except Exception as e:
+            logger.error(f"RAG pipeline error: {str(e)}")
+            return self._error_result(start_time)
+    
+    async def aquery(self, 
+                     user_query: str,
+                     chat_history: Optional[Sequence[Dict]] = None,
+                     max_sources: int = 5,
+                     similarity_threshold: float = 0.5,
+                     use_context: bool = True) -> RAGResult:
+        """
+        Async variant of query that warms up the Ollama model while retrieval runs
+        
+        Embedding and search run in a worker thread while Ollama loads the
+        model, so the slower of the two hides the other. Blocking calls never
+        run on the event loop.
+        
+        Args:
+            user_query: User's question
+            chat_history: Previous conversation messages
+            max_sources: Maximum number of source documents to retrieve
+            similarity_threshold: Minimum similarity for document retrieval
+            use_context: Whether to use retrieved context for generation
+            
+        Returns:
+            RAGResult with response and metadata
+        """
+        start_time = time.time()
+        warmup = asyncio.create_task(self._awarm_up())
+        
+        try:
+            sources, context_text = [], ""
+            if use_context:
+                sources, context_text = await asyncio.to_thread(
+                    self._retrieve, user_query, max_sources, similarity_threshold
                 )
-                
-                # Process retrieved chunks
-                sources = []
-                context_parts = []
-                
-                for chunk_id, similarity in similar_chunks:
-                    chunk_data = self.vector_store.get_chunk_metadata(chunk_id)
-                    if chunk_data:
-                        sources.append({
-                            "chunk_id": chunk_id,
-                            "content": chunk_data.get('content', '')[:200] + "...",
-                            "source_file": chunk_data.get('source_file', 'Unknown'),
-                            "similarity_score": float(similarity)
-                        })
-                        
-                        # Add full content to context
-                        full_content = chunk_data.get('content', '')
-                        if full_content:
-                            context_parts.append(f"Source: {chunk_data.get('source_file', 'Unknown')}\n{full_content}")
-                
-                # Combine context, limiting total length
-                context_text = "\n\n---\n\n".join(context_parts)
-                if len(context_text) > self.config.max_context_length:
-                    context_text = context_text[:self.config.max_context_length] + "...\n[Context truncated]"
-                
-                logger.info(f"Retrieved {len(sources)} relevant sources")
             
-            # Step 2: Generate response with Ollama
-            if use_context and context_text:
-                # Create RAG prompt with context
-                rag_prompt = self._create_rag_prompt(user_query, context_text, chat_history)
-                response = self.ollama.generate(rag_prompt, self.config.rag_system_prompt)
-            else:
-                # Generate response without context
-                messages = []
-                if chat_history:
-                    messages.extend(chat_history)
-                messages.append({"role": "user", "content": user_query})
-                response = self.ollama.chat(messages)
-            
-            response_time = (time.time() - start_time) * 1000
-            
-            result = RAGResult(
-                response=response,
-                sources=sources,
-                context_used=context_text,
-                response_time_ms=response_time,
-                retrieval_count=len(sources)
-            )
+            await warmup
+            response = await self._agenerate(user_query, context_text, chat_history, use_context)
             
-            logger.info(f"RAG query completed in {response_time:.2f}ms with {len(sources)} sources")
-            return result
+            return self._build_result(response, sources, context_text, start_time)
             
         except Exception as e:
             logger.error(f"RAG pipeline error: {str(e)}")
-            response_time = (time.time() - start_time) * 1000
-            
-            return RAGResult(
-                response="I apologize, but I encountered an error processing your request. Please try again.",
-                sources=[],
-                context_used="",
-                response_time_ms=response_time,
-                retrieval_count=0
+            if not warmup.done():
+                warmup.cancel()
+            return self._error_result(start_time)
+    
+    async def astream_query(self, 
+                            user_query: str,
+                            chat_history: Optional[Sequence[Dict]] = None,
+                            max_sources: int = 5,
+                            similarity_threshold: float = 0.5,
+                            use_context: bool = True) -> AsyncGenerator[Union[str, RAGResult], None]:
+        """
+        Streaming variant of aquery
+        
+        Yields response text chunks as Ollama produces them, so the first
+        tokens arrive after prompt evaluation instead of after the whole
+        generation, and finishes with a RAGResult whose response is the
+        full text.
+        
+        Args:
+            user_query: User's question
+            chat_history: Previous conversation messages
+            max_sources: Maximum number of source documents to retrieve
+            similarity_threshold: Minimum similarity for document retrieval
+            use_context: Whether to use retrieved context for generation
+            
+        Yields:
+            Response chunks (str), then the final RAGResult
+            
+        Raises:
+            Any pipeline error, after logging it; the caller has no way to tell
+            an apology yielded in place of the answer from the answer itself
+        """
+        start_time = time.time()
+        warmup = asyncio.create_task(self._awarm_up())
+        chunks = None
+        
+        try:
+            sources, context_text = [], ""
+            if use_context:
+                sources, context_text = await asyncio.to_thread(
+                    self._retrieve, user_query, max_sources, similarity_threshold
+                )
+            
+            await warmup
+            chunks = self._astream(user_query, context_text, chat_history, use_context)
+            
+            response_parts = []
+            async for chunk in chunks:
+                response_parts.append(chunk)
+                yield chunk
+            
+            yield self._build_result("".join(response_parts), sources, context_text, start_time)
+            
+        except Exception as e:
+            logger.error(f"RAG pipeline error: {str(e)}")
+            if not warmup.done():
+                warmup.cancel()
+            raise
+        finally:
+            if chunks is not None:
+                await chunks.aclose()
+    
+    async def aclose(self) -> None:
+        """Close the async Ollama client's connections"""
+        if self.ollama_async is not None:
+            await self.ollama_async.aclose()
+    
+    def _retrieve(self, user_query: str, max_sources: int,
+                  similarity_threshold: float) -> Tuple[List[Dict], str]:
+        """Embed the query, search the corpus and assemble the context block"""
+        sources = []
+        context_text = ""
+        
+        if self.vector_store.get_chunk_count() > 0:
+            logger.info(f"Retrieving context for query: '{user_query[:50]}...'")
+            
+            # Generate query embedding
+            query_embedding = self.embedder.embed_query(user_query)
+            
+            # Search for similar documents
+            similar_chunks = self.vector_store.search(
+                query_embedding=query_embedding,
+                limit=max_sources,
+                similarity_threshold=similarity_threshold
+            )
+            
+            # One SQL round-trip for all retrieved chunks
+            chunks_data = self.vector_store.get_chunks_metadata(
+                [chunk_id for chunk_id, _ in similar_chunks]
+            )
+            
+            sources, context_text = self._assemble_context(similar_chunks, chunks_data)
+            
+            logger.info(f"Retrieved {len(sources)} relevant sources")
+        
+        return sources, context_text
+    
+    def _assemble_context(self, similar_chunks: List[Tuple[str, float]],
+                          chunks_data: Dict[str, Dict]) -> Tuple[List[Dict], str]:
+        """Build the source list and the length-limited context block for search hits"""
+        sources = []
+        
+        # Write context straight into one buffer under the budget (tokens
+        # with a tokenizer, else characters), so nothing past it is copied
+        buf = io.StringIO()
+        remaining, measure, clip = self._context_budget()
+        truncated = False
+        
+        for chunk_id, similarity in similar_chunks:
+            chunk_data = chunks_data.get(chunk_id)
+            if chunk_data:
+                full_content = chunk_data.get('content', '')
+                source_file = chunk_data.get('source_file', 'Unknown')
+                sources.append({
+                    "chunk_id": chunk_id,
+                    "content": full_content[:200] + "...",
+                    "source_file": source_file,
+                    "similarity_score": float(similarity)
+                })
+                
+                # Add full content to context
+                if full_content and not truncated:
+                    for piece in (_CONTEXT_SEPARATOR if buf.tell() else "",
+                                  f"Source: {source_file}\n", full_content):
+                        size = measure(piece)
+                        if size > remaining:
+                            buf.write(clip(piece, remaining))
+                            truncated = True
+                            break
+                        buf.write(piece)
+                        remaining -= size
+        
+        if truncated:
+            buf.write("...\n[Context truncated]")
+        
+        return sources, buf.getvalue()
+    
+    def _generate(self, user_query: str, context_text: str,
+                  chat_history: Optional[Sequence[Dict]], use_context: bool) -> str:
+        """Generate the answer, grounded in the context when there is any"""
+        if use_context and context_text:
+            # Create RAG prompt with context
+            rag_prompt = self._create_rag_prompt(user_query, context_text, chat_history)
+            return self.ollama.generate(rag_prompt, self.config.rag_system_prompt)
+        
+        # Generate response without context
+        return self.ollama.chat(self._chat_messages(user_query, chat_history))
+    
+    def _stream(self, user_query: str, context_text: str,
+                chat_history: Optional[Sequence[Dict]], use_context: bool) -> Generator[str, None, None]:
+        """Streaming counterpart of _generate"""
+        if use_context and context_text:
+            rag_prompt = self._create_rag_prompt(user_query, context_text, chat_history)
+            return self.ollama.stream_generate(rag_prompt, self.config.rag_system_prompt)
+        
+        return self.ollama.stream_chat(self._chat_messages(user_query, chat_history))
+    
+    async def _awarm_up(self) -> bool:
+        """Load the Ollama model without blocking the event loop"""
+        if self.ollama_async is not None:
+            return await self.ollama_async.awarm_up()
+        return await asyncio.to_thread(self.ollama.warm_up)
+    
+    async def _agenerate(self, user_query: str, context_text: str,
+                         chat_history: Optional[Sequence[Dict]], use_context: bool) -> str:
+        """Async counterpart of _generate"""
+        if self.ollama_async is None:
+            return await asyncio.to_thread(
+                self._generate, user_query, context_text, chat_history, use_context
             )
+        
+        if use_context and context_text:
+            rag_prompt = self._create_rag_prompt(user_query, context_text, chat_history)
+            return await self.ollama_async.agenerate(rag_prompt, self.config.rag_system_prompt)
+        
+        return await self.ollama_async.achat(self._chat_messages(user_query, chat_history))
+    
+    async def _astream(self, user_query: str, context_text: str,
+                       chat_history: Optional[Sequence[Dict]], use_context: bool) -> AsyncGenerator[str, None]:
+        """Async counterpart of _stream"""
+        if self.ollama_async is not None:
+            if use_context and context_text:
+                rag_prompt = self._create_rag_prompt(user_query, context_text, chat_history)
+                stream = self.ollama_async.astream_generate(rag_prompt, self.config.rag_system_prompt)
+            else:
+                stream = self.ollama_async.astream_chat(self._chat_messages(user_query, chat_history))
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+            return
+        
+        # The requests stream is blocking, so each read happens off the event loop
+        chunks = self._stream(user_query, context_text, chat_history, use_context)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            try:
+                chunks.close()
+            except ValueError:
+                # Still running in a worker thread after cancellation
+                pass
+    
+    @staticmethod
+    def _chat_messages(user_query: str, chat_history: Optional[Sequence[Dict]]) -> List[Dict]:
+        """Chat messages for answering without retrieved context"""
+        messages = []
+        if chat_history:
+            messages.extend(chat_history)
+        messages.append({"role": "user", "content": user_query})
+        return messages
+    
+    def _build_result(self, response: str, sources: List[Dict], context_text: str,
+                      start_time: float) -> RAGResult:
+        """Package a response with its retrieval metadata and timing"""
+        response_time = (time.time() - start_time) * 1000
+        
+        result = RAGResult(
+            response=response,
+            sources=sources,
+            context_used=context_text,
+            response_time_ms=response_time,
+            retrieval_count=len(sources)
+        )
+        
+        logger.info(f"RAG query completed in {response_time:.2f}ms with {len(sources)} sources")
+        return result
+    
+    def _error_result(self, start_time: float) -> RAGResult:
+        """Result returned to the caller when the pipeline fails"""
+        response_time = (time.time() - start_time) * 1000
+        
+        return RAGResult(
+            response="I apologize, but I encountered an error processing your request. Please try again.",
+            sources=[],
+            context_used="",
+            response_time_ms=response_time,
+            retrieval_count=0
+        )
     
     def _create_rag_prompt(self, 
                           user_query: str, 
                           context: str, 
-                          chat_history: Optional[List[Dict]] = None) -> str:
+                          chat_history: Optional[Sequence[Dict]] = None) -> str:
         """
         Create a RAG prompt with context and history
         
@@ -172,13 +463,11 @@ class RAGPipeline:
         
         # Add chat history if available
         if chat_history:
-            prompt_parts.append("Previous conversation:")
-            for msg in chat_history[-3:]:  # Last 3 messages for context
-                role = msg.get('role', '')
-                content = msg.get('content', '')
-                if role and content:
-                    prompt_parts.append(f"{role.title()}: {content}")
-            prompt_parts.append("")
+            recent = tuple(
+                (msg.get('role', ''), msg.get('content', ''))
+                for msg in _last_messages(chat_history, 3)  # Last 3 messages for context
+            )
+            prompt_parts.append(_render_history(recent))
         
         # Add document context
         prompt_parts.append("Based on the following context from the user's documents:")
@@ -196,7 +485,7 @@ class RAGPipeline:
     
     def simple_chat(self, 
                    user_message: str, 
-                   chat_history: Optional[List[Dict]] = None) -> str:
+                   chat_history: Optional[Sequence[Dict]] = None) -> str:
         """
         Simple chat without document retrieval
         
@@ -218,7 +507,7 @@ class RAGPipeline:
             
             # Add chat history
             if chat_history:
-                messages.extend(chat_history[-5:])  # Last 5 messages
+                messages.extend(_last_messages(chat_history, 5))  # Last 5 messages
             
             # Add current message
             messages.append({"role": "user", "content": user_message})
@@ -0,0 +1,42 @@
+"""
+Tests for the streaming chat endpoint's error handling
+"""
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Backend modules import each other as top-level packages
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import query
+from llm.ollama_client import OllamaConfig
+from llm.rag_pipeline import RAGPipeline
+
+class _IdleOllama:
+    def warm_up(self) -> bool:
+        return True
+
+def _failing_pipeline() -> RAGPipeline:
+    """Pipeline whose retrieval fails before any token is generated"""
+    def fail(*args):
+        raise RuntimeError("vector store unavailable")
+
+    rag = RAGPipeline.__new__(RAGPipeline)
+    rag.config = OllamaConfig()
+    rag.ollama = _IdleOllama()
+    rag.ollama_async = None
+    rag._retrieve = fail
+    return rag
+
+def test_failure_before_first_token_sends_error_event(monkeypatch):
+    monkeypatch.setattr(query, "_rag_pipeline", _failing_pipeline())
+    app = FastAPI()
+    app.include_router(query.router)
+
+    with TestClient(app) as client:
+        response = client.post("/chat/stream", json={"message": "hello"})
+
+    events = [line.split(": ", 1)[1] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == ["status", "error"]
@@ -0,0 +1,41 @@
+"""
+Tests for DOCX extraction from untrusted uploads
+"""
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+# Backend modules import each other as top-level packages
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.docx_extractor import DOCXExtractor
+
+SECRET = "external entity contents"
+
+def _xxe_docx(tmp_path: Path) -> Path:
+    """DOCX whose document.xml pulls a local file in through an external entity"""
+    secret = tmp_path / "secret.txt"
+    secret.write_text(SECRET)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<!DOCTYPE w:document [<!ENTITY secret SYSTEM "{secret.as_uri()}">]>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        '<w:body><w:p><w:r><w:t>before &secret; after</w:t></w:r></w:p></w:body>'
+        '</w:document>'
+    )
+    path = tmp_path / "xxe.docx"
+    with zipfile.ZipFile(path, 'w') as docx:
+        docx.writestr('[Content_Types].xml', '<Types/>')
+        docx.writestr('word/document.xml', document)
+    return path
+
+def test_external_entities_are_not_resolved(tmp_path):
+    result = DOCXExtractor().extract_text(str(_xxe_docx(tmp_path)))
+    assert SECRET not in result["text"]
+
+def test_expat_walk_does_not_resolve_external_entities(tmp_path):
+    with zipfile.ZipFile(_xxe_docx(tmp_path)) as docx:
+        document_xml = io.BytesIO(docx.read('word/document.xml'))
+    paragraphs = list(DOCXExtractor()._iter_paragraphs_expat(document_xml))
+    assert SECRET not in "".join(paragraphs)
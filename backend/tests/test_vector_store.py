@@ -0,0 +1,98 @@
+"""
+Tests for the append-only vector store files
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Backend modules import each other as top-level packages
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embeddings.chunker import TextChunk
+from embeddings.store import VectorStore
+
+DIM = 8
+
+def _chunks(prefix: str, count: int, source_file: str):
+    """Chunks with a distinct random embedding each"""
+    chunks, embeddings = [], []
+    for i in range(count):
+        chunk_id = f"{prefix}-{i}"
+        chunks.append(TextChunk(content=chunk_id, metadata={}, chunk_id=chunk_id,
+                                source_file=source_file))
+        embeddings.append(_vector(chunk_id))
+    return chunks, embeddings
+
+def _vector(chunk_id: str) -> np.ndarray:
+    """Deterministic random vector per chunk id"""
+    rng = np.random.default_rng(list(chunk_id.encode()))
+    return rng.standard_normal(DIM).astype(np.float32)
+
+def _store(tmp_path: Path) -> VectorStore:
+    return VectorStore(db_path=str(tmp_path / "corpus.db"),
+                       vector_path=str(tmp_path / "vectors.bin"))
+
+def test_two_instances_append_without_clobbering(tmp_path):
+    seed = _store(tmp_path)
+    seed.add_chunks(*_chunks("seed", 2, "seed.txt"))
+
+    # Both instances load the same two rows before either appends
+    a = _store(tmp_path)
+    b = _store(tmp_path)
+    a.add_chunks(*_chunks("a", 3, "a.txt"))
+    b.add_chunks(*_chunks("b", 2, "b.txt"))
+
+    reloaded = _store(tmp_path)
+    assert sorted(reloaded._id_to_row) == ["a-0", "a-1", "a-2", "b-0", "b-1", "seed-0", "seed-1"]
+    assert reloaded._matrix.shape[0] == 7
+
+    # Every id still points at its own vector
+    for chunk_id in reloaded._id_to_row:
+        results = reloaded.search(_vector(chunk_id), limit=1, similarity_threshold=-1.0)
+        assert results[0][0] == chunk_id
+
+def test_delete_after_other_instance_appended(tmp_path):
+    a = _store(tmp_path)
+    b = _store(tmp_path)
+    a.add_chunks(*_chunks("a", 2, "a.txt"))
+    b.add_chunks(*_chunks("b", 2, "b.txt"))
+
+    # a's view predates b's rows; the delete must not drop them
+    a.delete_file("a.txt")
+
+    reloaded = _store(tmp_path)
+    assert sorted(reloaded._id_to_row) == ["b-0", "b-1"]
+
+def test_metadata_migration_runs_once(tmp_path):
+    _store(tmp_path)
+    db = sqlite3.connect(tmp_path / "corpus.db")
+    db.execute("PRAGMA user_version = 0")
+    db.execute("INSERT INTO chunks (chunk_id, source_file, content, metadata) "
+               "VALUES ('old', 'old.txt', 'old', '{\"page\": 1}')")
+    db.commit()
+
+    store = _store(tmp_path)
+    assert db.execute("SELECT typeof(metadata) FROM chunks").fetchone()[0] == "blob"
+    assert db.execute("PRAGMA user_version").fetchone()[0] == 1
+    assert store.get_chunk("old")["metadata"] == {"page": 1}
+
+    # Already migrated: a stray JSON row is left alone rather than rescanned
+    db.execute("INSERT INTO chunks (chunk_id, source_file, content, metadata) "
+               "VALUES ('late', 'late.txt', 'late', '{}')")
+    db.commit()
+    _store(tmp_path)
+    assert db.execute("SELECT typeof(metadata) FROM chunks WHERE chunk_id = 'late'").fetchone()[0] == "text"
+    db.close()
+
+def test_file_index_built_on_first_filtered_search(tmp_path):
+    _store(tmp_path).add_chunks(*_chunks("a", 2, "a.txt"))
+
+    store = _store(tmp_path)
+    assert store._file_chunk_ids is None
+    store.add_chunks(*_chunks("b", 2, "b.txt"))
+
+    results = store.search(_vector("a-0"), limit=5, similarity_threshold=-1.0, file_filter=["b.txt"])
+    assert sorted(chunk_id for chunk_id, _ in results) == ["b-0", "b-1"]
+    assert store._file_chunk_ids is not None
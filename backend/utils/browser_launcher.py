@@ -4,12 +4,34 @@ Browser launcher utilities for LibreWolf integration
 import subprocess
 import logging
 import os
+import functools
 from pathlib import Path
 from typing import Optional
 import psutil
 
 logger = logging.getLogger(__name__)
 
+_LIBREWOLF_PREFIX = 'librewolf'
+
+@functools.lru_cache(maxsize=8)
+def _resolve_librewolf_path(cwd: str) -> str:
+    """Probe the default install locations relative to cwd; cached per cwd so
+    repeated launches skip the filesystem checks (misses are not cached)"""
+    # Default paths to check
+    possible_paths = [
+        "./librewolf/LibreWolf/librewolf.exe",
+        "./librewolf/LibreWolf-Portable.exe",
+        "../librewolf/LibreWolf/librewolf.exe",
+        "../librewolf/LibreWolf-Portable.exe",
+    ]
+    
+    for path in possible_paths:
+        candidate = os.path.join(cwd, path)
+        if os.path.exists(candidate):
+            return os.path.abspath(candidate)
+    
+    raise FileNotFoundError("LibreWolf executable not found")
+
 class BrowserLauncher:
     """Launch and manage LibreWolf browser instances"""
     
@@ -20,19 +42,7 @@ class BrowserLauncher:
     
     def _find_librewolf_path(self) -> str:
         """Find LibreWolf executable path"""
-        # Default paths to check
-        possible_paths = [
-            "./librewolf/LibreWolf/librewolf.exe",
-            "./librewolf/LibreWolf-Portable.exe",
-            "../librewolf/LibreWolf/librewolf.exe",
-            "../librewolf/LibreWolf-Portable.exe",
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                return os.path.abspath(path)
-        
-        raise FileNotFoundError("LibreWolf executable not found")
+        return _resolve_librewolf_path(os.getcwd())
     
     def launch(self, url: str = "about:blank", private: bool = True, headless: bool = False) -> bool:
         """
@@ -62,10 +72,13 @@ class BrowserLauncher:
             
             logger.info(f"Launching LibreWolf: {' '.join(cmd)}")
             
+            # Output is never read; undrained pipes would stall the browser
+            # once the OS pipe buffer fills
             self.process = subprocess.Popen(
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                close_fds=True,
                 creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             )
             
@@ -115,9 +128,11 @@ class BrowserLauncher:
     def get_librewolf_processes(self) -> list:
         """Get all running LibreWolf processes"""
         processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+        # Only the name is inspected; asking for cmdline too costs an extra
+        # /proc read per process
+        for proc in psutil.process_iter(['pid', 'name']):
             try:
-                if 'librewolf' in proc.info['name'].lower():
+                if (proc.info['name'] or '').lower().startswith(_LIBREWOLF_PREFIX):
                     processes.append(proc.info)
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 continue
@@ -7,134 +7,237 @@ import logging
 from typing import Any, Dict, Optional, Callable, Union
 import hashlib
 import json
-import pickle
+import mmap
+import os
 from pathlib import Path
 import threading
 from functools import wraps
+from collections import OrderedDict
+
+import numpy as np
+
+# Optional msgpack serialization for the file cache; without it the file
+# cache stores nothing (entries are never pickled)
+try:
+    import msgpack
+    _HAVE_MSGPACK = True
+except ImportError:
+    msgpack = None
+    _HAVE_MSGPACK = False
 
 logger = logging.getLogger(__name__)
 
+# File cache entries start with a format byte; files without it (pickles
+# from older versions) are treated as misses and deleted
+_FORMAT_MSGPACK = b'M'
+_NDARRAY_EXT_TYPE = 7
+_TUPLE_EXT_TYPE = 8
+
+def _msgpack_default(obj: Any) -> Any:
+    """
+    Pack what msgpack can't natively: numpy arrays and tuples as ext types,
+    numpy scalars as Python scalars, dict and list subclasses as plain ones
+    
+    Anything else (including namedtuples and other tuple subclasses, which
+    would come back as plain tuples) raises TypeError and isn't cached.
+    """
+    if isinstance(obj, np.ndarray):
+        payload = msgpack.packb([obj.dtype.str, list(obj.shape), obj.tobytes()], use_bin_type=True)
+        return msgpack.ExtType(_NDARRAY_EXT_TYPE, payload)
+    if type(obj) is tuple:
+        return msgpack.ExtType(_TUPLE_EXT_TYPE, _packb(list(obj)))
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, list):
+        return list(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    """Rebuild numpy arrays and tuples packed by _msgpack_default"""
+    if code == _NDARRAY_EXT_TYPE:
+        dtype, shape, buffer = msgpack.unpackb(data, raw=False)
+        return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+    if code == _TUPLE_EXT_TYPE:
+        return tuple(_unpackb(data))
+    return msgpack.ExtType(code, data)
+
+def _packb(obj: Any) -> bytes:
+    """msgpack-encode a value, routing tuples through _msgpack_default"""
+    # strict_types keeps msgpack from silently packing tuples as lists
+    return msgpack.packb(obj, default=_msgpack_default, use_bin_type=True, strict_types=True)
+
+def _unpackb(data: Union[bytes, memoryview]) -> Any:
+    """Decode bytes written by _packb"""
+    # Non-string dict keys (ints from cached results) are allowed back in
+    return msgpack.unpackb(data, raw=False, ext_hook=_msgpack_ext_hook, strict_map_key=False)
+
+# Cache keys are either caller-chosen strings or the 16-byte digests made by
+# _generate_key; FileCache uses a digest as its file name without rehashing
+CacheKey = Union[str, bytes]
+_KEY_DIGEST_SIZE = 16
+
+def _generate_key(*args, **kwargs) -> bytes:
+    """Generate a cache key digest from arguments"""
+    # Fast path for all-string calls (e.g. function name plus query text):
+    # hash the length-prefixed text directly instead of JSON-encoding it
+    if not kwargs and all(isinstance(arg, str) for arg in args):
+        digest = hashlib.blake2b(digest_size=_KEY_DIGEST_SIZE)
+        for arg in args:
+            encoded = arg.encode('utf-8')
+            digest.update(len(encoded).to_bytes(8, 'little'))
+            digest.update(encoded)
+        return digest.digest()
+    
+    key_data = {
+        'args': args,
+        'kwargs': kwargs
+    }
+    key_str = json.dumps(key_data, sort_keys=True, default=str)
+    return hashlib.md5(key_str.encode()).digest()
+
 class MemoryCache:
     """
     Thread-safe in-memory cache with TTL support
+    
+    Keys are striped across independently locked shards so hits on different
+    keys do not contend. LRU order and capacity are tracked per shard, which
+    makes eviction approximate; small caches use a single shard and keep
+    exact LRU.
     """
     
-    def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
+    # Shards never hold fewer than this many entries on average
+    _MIN_SHARD_SIZE = 32
+    
+    def __init__(self, max_size: int = 1000, default_ttl: int = 3600, num_shards: int = 16):
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._access_times: Dict[str, float] = {}
-        self._lock = threading.RLock()
         
-    def _generate_key(self, *args, **kwargs) -> str:
+        # Power-of-two shard count so a key's shard is a mask of its hash
+        shard_count = 1
+        while shard_count * 2 <= min(num_shards, max(1, max_size // self._MIN_SHARD_SIZE)):
+            shard_count *= 2
+        self._shard_mask = shard_count - 1
+        self._shard_size = max(1, max_size // shard_count)
+        
+        # Insertion order doubles as recency order: hits move to the end,
+        # eviction pops from the front. Expired entries are dropped lazily on
+        # get; a full sweep of the shard runs every shard_size // 4 writes to
+        # reclaim entries that are never read
+        self._shards = [
+            {'cache': OrderedDict(), 'lock': threading.Lock(), 'writes': 0}
+            for _ in range(shard_count)
+        ]
+        
+    def _generate_key(self, *args, **kwargs) -> bytes:
         """Generate a cache key from arguments"""
-        key_data = {
-            'args': args,
-            'kwargs': kwargs
-        }
-        key_str = json.dumps(key_data, sort_keys=True, default=str)
-        return hashlib.md5(key_str.encode()).hexdigest()
+        return _generate_key(*args, **kwargs)
+    
+    def _shard(self, key: CacheKey) -> Dict[str, Any]:
+        """Shard owning a key"""
+        return self._shards[hash(key) & self._shard_mask]
     
-    def _cleanup_expired(self):
-        """Remove expired entries"""
+    @staticmethod
+    def _cleanup_expired(cache: "OrderedDict[str, Dict[str, Any]]"):
+        """Remove expired entries from one shard; the caller holds its lock"""
         current_time = time.time()
         expired_keys = []
         
-        for key, entry in self._cache.items():
+        for key, entry in cache.items():
             if current_time > entry['expires']:
                 expired_keys.append(key)
         
         for key in expired_keys:
-            del self._cache[key]
-            self._access_times.pop(key, None)
+            del cache[key]
     
-    def _evict_lru(self):
-        """Evict least recently used entries if cache is full"""
-        if len(self._cache) >= self.max_size:
-            # Find least recently used key
-            lru_key = min(self._access_times.keys(), key=lambda k: self._access_times[k])
-            del self._cache[lru_key]
-            del self._access_times[lru_key]
-    
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: CacheKey) -> Optional[Any]:
         """Get value from cache"""
-        with self._lock:
-            self._cleanup_expired()
-            
-            if key in self._cache:
-                entry = self._cache[key]
+        shard = self._shard(key)
+        with shard['lock']:
+            cache = shard['cache']
+            if key in cache:
+                entry = cache[key]
                 if time.time() <= entry['expires']:
-                    self._access_times[key] = time.time()
+                    cache.move_to_end(key)
                     return entry['value']
                 else:
-                    del self._cache[key]
-                    self._access_times.pop(key, None)
+                    del cache[key]
             
             return None
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    def set(self, key: CacheKey, value: Any, ttl: Optional[int] = None) -> None:
         """Set value in cache"""
-        with self._lock:
-            self._cleanup_expired()
-            self._evict_lru()
+        shard = self._shard(key)
+        with shard['lock']:
+            cache = shard['cache']
+            shard['writes'] += 1
+            if shard['writes'] >= max(1, self._shard_size // 4):
+                self._cleanup_expired(cache)
+                shard['writes'] = 0
             
             ttl = ttl or self.default_ttl
             expires = time.time() + ttl
             
-            self._cache[key] = {
+            cache[key] = {
                 'value': value,
                 'expires': expires
             }
-            self._access_times[key] = time.time()
+            cache.move_to_end(key)
+            
+            # Evict least recently used entries
+            while len(cache) > self._shard_size:
+                cache.popitem(last=False)
     
-    def delete(self, key: str) -> bool:
+    def delete(self, key: CacheKey) -> bool:
         """Delete key from cache"""
-        with self._lock:
-            if key in self._cache:
-                del self._cache[key]
-                self._access_times.pop(key, None)
+        shard = self._shard(key)
+        with shard['lock']:
+            if key in shard['cache']:
+                del shard['cache'][key]
                 return True
             return False
     
     def clear(self) -> None:
         """Clear all cache entries"""
-        with self._lock:
-            self._cache.clear()
-            self._access_times.clear()
+        for shard in self._shards:
+            with shard['lock']:
+                shard['cache'].clear()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        with self._lock:
-            self._cleanup_expired()
-            return {
-                'size': len(self._cache),
-                'max_size': self.max_size,
-                'hit_rate': getattr(self, '_hits', 0) / max(getattr(self, '_requests', 1), 1)
-            }
+        size = 0
+        for shard in self._shards:
+            with shard['lock']:
+                self._cleanup_expired(shard['cache'])
+                size += len(shard['cache'])
+        
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'shards': len(self._shards),
+            'hit_rate': getattr(self, '_hits', 0) / max(getattr(self, '_requests', 1), 1)
+        }
 
 class AsyncMemoryCache(MemoryCache):
     """
     Async version of memory cache
-    """
     
-    def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
-        super().__init__(max_size, default_ttl)
-        self._async_lock = asyncio.Lock()
+    The shard locks are held only for dict operations, so calls complete
+    without awaiting and need no separate asyncio lock.
+    """
     
-    async def aget(self, key: str) -> Optional[Any]:
+    async def aget(self, key: CacheKey) -> Optional[Any]:
         """Async get value from cache"""
-        async with self._async_lock:
-            return self.get(key)
+        return self.get(key)
     
-    async def aset(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    async def aset(self, key: CacheKey, value: Any, ttl: Optional[int] = None) -> None:
         """Async set value in cache"""
-        async with self._async_lock:
-            self.set(key, value, ttl)
+        self.set(key, value, ttl)
     
-    async def adelete(self, key: str) -> bool:
+    async def adelete(self, key: CacheKey) -> bool:
         """Async delete key from cache"""
-        async with self._async_lock:
-            return self.delete(key)
+        return self.delete(key)
 
 class FileCache:
     """
@@ -145,25 +248,73 @@ class FileCache:
         self.cache_dir = Path(cache_dir)
         self.max_file_size = max_file_size
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if not _HAVE_MSGPACK:
+            logger.warning("msgpack not installed, file cache disabled")
+        
+        # Entry count is scanned once here and then maintained on set/delete,
+        # so stats never have to walk the directory
+        self._count_lock = threading.Lock()
+        self._count = sum(1 for _ in self.cache_dir.glob("*.cache"))
+    
+    def _adjust_count(self, delta: int) -> None:
+        """Apply a change to the tracked entry count"""
+        with self._count_lock:
+            self._count = max(0, self._count + delta)
+    
+    def get_count(self) -> int:
+        """Number of entries currently in the cache directory"""
+        with self._count_lock:
+            return self._count
     
-    def _get_file_path(self, key: str) -> Path:
+    def _get_file_path(self, key: CacheKey) -> Path:
         """Get file path for cache key"""
-        safe_key = hashlib.md5(key.encode()).hexdigest()
+        if isinstance(key, bytes) and len(key) == _KEY_DIGEST_SIZE:
+            # Already a digest from _generate_key
+            safe_key = key.hex()
+        else:
+            safe_key = hashlib.md5(key if isinstance(key, bytes) else key.encode()).hexdigest()
         return self.cache_dir / f"{safe_key}.cache"
     
-    def get(self, key: str) -> Optional[Any]:
+    def _serialize(self, data: Dict[str, Any]) -> bytes:
+        """Encode an entry as msgpack; raises TypeError for values it can't hold"""
+        return _FORMAT_MSGPACK + _packb(data)
+    
+    def _deserialize(self, raw: Union[bytes, memoryview]) -> Optional[Dict[str, Any]]:
+        """Decode an entry written by _serialize, None for any other format"""
+        if raw[:1] != _FORMAT_MSGPACK:
+            return None
+        return _unpackb(raw[1:])
+    
+    def get(self, key: CacheKey) -> Optional[Any]:
         """Get value from file cache"""
         try:
+            if not _HAVE_MSGPACK:
+                return None
             file_path = self._get_file_path(key)
             if not file_path.exists():
                 return None
             
             with open(file_path, 'rb') as f:
-                data = pickle.load(f)
+                if os.fstat(f.fileno()).st_size >= mmap.PAGESIZE:
+                    # Decode straight from the page cache instead of first
+                    # copying the whole file into a bytes object
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                            memoryview(mapped) as view:
+                        data = self._deserialize(view)
+                else:
+                    data = self._deserialize(f.read())
+            
+            if data is None:
+                # Written by an older version (pickle); never unpickle it
+                file_path.unlink(missing_ok=True)
+                self._adjust_count(-1)
+                return None
             
             # Check if expired
             if time.time() > data['expires']:
-                file_path.unlink(missing_ok=True)
+                if file_path.exists():
+                    file_path.unlink(missing_ok=True)
+                    self._adjust_count(-1)
                 return None
             
             return data['value']
@@ -172,9 +323,11 @@ class FileCache:
             logger.error(f"Error reading from file cache: {str(e)}")
             return None
     
-    def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
+    def set(self, key: CacheKey, value: Any, ttl: int = 3600) -> bool:
         """Set value in file cache"""
         try:
+            if not _HAVE_MSGPACK:
+                return False
             file_path = self._get_file_path(key)
             expires = time.time() + ttl
             
@@ -184,27 +337,36 @@ class FileCache:
                 'created': time.time()
             }
             
+            try:
+                serialized = self._serialize(data)
+            except (TypeError, ValueError, OverflowError) as e:
+                logger.debug(f"Not caching value msgpack can't encode: {str(e)}")
+                return False
+            
             # Check size before writing
-            serialized = pickle.dumps(data)
             if len(serialized) > self.max_file_size:
                 logger.warning(f"Cache value too large: {len(serialized)} bytes")
                 return False
             
+            is_new = not file_path.exists()
             with open(file_path, 'wb') as f:
                 f.write(serialized)
             
+            if is_new:
+                self._adjust_count(1)
             return True
             
         except Exception as e:
             logger.error(f"Error writing to file cache: {str(e)}")
             return False
     
-    def delete(self, key: str) -> bool:
+    def delete(self, key: CacheKey) -> bool:
         """Delete key from file cache"""
         try:
             file_path = self._get_file_path(key)
             if file_path.exists():
                 file_path.unlink()
+                self._adjust_count(-1)
                 return True
             return False
         except Exception as e:
@@ -216,6 +378,8 @@ class FileCache:
         try:
             for file_path in self.cache_dir.glob("*.cache"):
                 file_path.unlink(missing_ok=True)
+            with self._count_lock:
+                self._count = 0
         except Exception as e:
             logger.error(f"Error clearing file cache: {str(e)}")
 
@@ -237,7 +401,7 @@ def cache(ttl: int = 3600, use_file_cache: bool = False):
             @wraps(func)
             async def async_wrapper(*args, **kwargs):
                 cache_instance = _file_cache if use_file_cache else _async_memory_cache
-                key = f"{func.__name__}:{_memory_cache._generate_key(*args, **kwargs)}"
+                key = _generate_key(func.__name__, *args, **kwargs)
                 
                 # Try to get from cache
                 if use_file_cache:
@@ -264,7 +428,7 @@ def cache(ttl: int = 3600, use_file_cache: bool = False):
             @wraps(func)
             def sync_wrapper(*args, **kwargs):
                 cache_instance = _file_cache if use_file_cache else _memory_cache
-                key = f"{func.__name__}:{cache_instance._generate_key(*args, **kwargs)}"
+                key = _generate_key(func.__name__, *args, **kwargs)
                 
                 # Try to get from cache
                 result = cache_instance.get(key)
@@ -295,6 +459,6 @@ def get_cache_stats() -> Dict[str, Any]:
         'async_memory_cache': _async_memory_cache.get_stats(),
         'file_cache': {
             'cache_dir': str(_file_cache.cache_dir),
-            'file_count': len(list(_file_cache.cache_dir.glob("*.cache")))
+            'file_count': _file_cache.get_count()
         }
     }
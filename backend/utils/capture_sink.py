@@ -0,0 +1,214 @@
+"""
+Append-only JSONL sink for captured clipboard content
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator, Optional, Union
+from dataclasses import dataclass
+
+# Optional: C JSON encoder producing UTF-8 bytes directly, falls back to json
+try:
+    import orjson
+    _HAVE_ORJSON = True
+except ImportError:
+    _HAVE_ORJSON = False
+
+logger = logging.getLogger(__name__)
+
+_decode = orjson.loads if _HAVE_ORJSON else json.loads
+
+@dataclass(frozen=True, slots=True)
+class Capture:
+    """One accepted capture; slotted so a busy session allocates less than a
+    dict per event. Serializes to the same keys, in the same order."""
+    timestamp: str
+    content: str
+    length: int
+
+def encode_record(record: Union[Capture, Dict[str, Any]], indent: bool = False) -> bytes:
+    """Serialize a capture record to UTF-8 JSON, two-space indented if asked"""
+    if _HAVE_ORJSON:
+        # orjson serializes slotted dataclasses natively
+        return orjson.dumps(record, option=orjson.OPT_INDENT_2 if indent else 0)
+    if isinstance(record, Capture):
+        record = {
+            'timestamp': record.timestamp,
+            'content': record.content,
+            'length': record.length
+        }
+    return json.dumps(record, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+def iter_records(path: Path) -> Generator[Dict[str, Any], None, None]:
+    """Read the records of a capture log back one at a time"""
+    with open(path, 'rb') as f:
+        for line in f:
+            yield _decode(line)
+
+def _open_append(path: Path) -> int:
+    """Open a file for O_APPEND writes, creating it if needed"""
+    return os.open(
+        path,
+        os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0),
+        0o644
+    )
+
+def _write_all(fd: int, buf: bytearray):
+    """Write a whole buffer to a descriptor, resuming after short writes"""
+    view = memoryview(buf)
+    while view:
+        view = view[os.write(fd, view):]
+
+def _background_thread_priority():
+    """
+    Move the calling thread onto the last allowed CPU at a lower priority
+    
+    Linux only: there both calls apply to the calling thread rather than the
+    whole process. Failures are ignored; this is only a scheduling hint.
+    """
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        cpus = os.sched_getaffinity(0)
+        if len(cpus) > 1:
+            os.sched_setaffinity(0, {max(cpus)})
+        os.nice(5)
+    except OSError as e:
+        logger.debug(f"Could not lower capture writer priority: {str(e)}")
+
+class CaptureSink:
+    """
+    Filter clipboard captures and append them to a JSONL file
+    
+    push() runs on the watcher's callback thread and only filters and
+    enqueues; a writer thread encodes whatever is queued and appends it with
+    one O_APPEND write, so a slow disk never delays the next clipboard event.
+    """
+    
+    # Captures waiting for the writer thread before new ones are dropped
+    QUEUE_SIZE = 1024
+    
+    def __init__(self, out_path: Path, min_len: int = 20, dedup: bool = True,
+                 text_path: Optional[Path] = None,
+                 text_format: Optional[Callable[[Capture], bytes]] = None):
+        """
+        Open the capture log and start the writer thread
+        
+        Args:
+            out_path: JSONL file to append to; its directory must exist
+            min_len: Minimum length of the stripped content to keep
+            dedup: Skip a capture identical to the last one accepted
+            text_path: Optional human-readable file appended alongside the log
+            text_format: Renders one record for text_path
+        """
+        self.out_path = Path(out_path)
+        self.min_len = min_len
+        self.dedup = dedup
+        self.count = 0
+        
+        # Last accepted capture, so repeated events for it are skipped
+        self._last_content = None
+        # Formatted timestamp of the last capture, reused within the same second
+        self._stamp_second = None
+        self._stamp = ""
+        
+        self._fd = _open_append(self.out_path)
+        # The text copy grows with the log, so it is readable during the
+        # session and needs no rebuild at the end
+        self.text_path = Path(text_path) if text_path is not None else None
+        self._text_format = text_format
+        self._text_fd = _open_append(self.text_path) if self.text_path is not None else None
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._writer = threading.Thread(target=self._drain, daemon=True)
+        self._writer.start()
+    
+    def _timestamp(self) -> str:
+        """Local time of a capture, formatted once per wall-clock second"""
+        now = int(time.time())
+        if now != self._stamp_second:
+            self._stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+            self._stamp_second = now
+        return self._stamp
+    
+    def push(self, content: str) -> Optional[Capture]:
+        """
+        Offer a capture to the sink
+        
+        Args:
+            content: Clipboard text
+        
+        Returns:
+            The queued record, or None if the capture was filtered or dropped
+        """
+        # Length first; the stripped copy is only made when the content has
+        # surrounding whitespace that could bring it under the minimum
+        n = len(content)
+        if n < self.min_len or ((content[0].isspace() or content[-1].isspace())
+                                and len(content.strip()) < self.min_len):
+            return None
+        
+        # Watchers often report the same selection more than once
+        if self.dedup:
+            if content == self._last_content:
+                return None
+            self._last_content = content
+        
+        record = Capture(self._timestamp(), content, n)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("Capture writer is behind, dropping capture")
+            return None
+        
+        self.count += 1
+        return record
+    
+    def _drain(self):
+        """Writer thread: append everything queued in one write per wakeup"""
+        # Keep the writer out of the way of the browser and the watcher
+        _background_thread_priority()
+        
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            buf = bytearray()
+            text_buf = bytearray()
+            for record in batch:
+                if record is None:
+                    done = True
+                    break
+                buf += encode_record(record)
+                buf += b"\n"
+                if self._text_fd is not None:
+                    text_buf += self._text_format(record)
+            
+            try:
+                _write_all(self._fd, buf)
+                if text_buf:
+                    _write_all(self._text_fd, text_buf)
+            except OSError as e:
+                logger.error(f"Error writing captures to {self.out_path}: {str(e)}")
+    
+    def close(self):
+        """Write out queued captures, stop the writer and close the files"""
+        if self._fd is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        os.close(self._fd)
+        self._fd = None
+        if self._text_fd is not None:
+            os.close(self._text_fd)
+            self._text_fd = None
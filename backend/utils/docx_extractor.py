@@ -3,18 +3,67 @@ DOCX text extraction utilities
 """
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 import zipfile
-import xml.etree.ElementTree as ET
+import functools
+from xml.parsers import expat
+
+# lxml's iterparse does the per-element work in C and only surfaces whole
+# paragraphs; without it the document is streamed through expat callbacks
+try:
+    from lxml import etree as LET
+    _HAVE_LXML = True
+    _XML_ERRORS = (expat.ExpatError, LET.XMLSyntaxError)
+except ImportError:
+    LET = None
+    _HAVE_LXML = False
+    _XML_ERRORS = (expat.ExpatError,)
 
 logger = logging.getLogger(__name__)
 
+# Bytes of decompressed document.xml fed to expat per parse call
+_EXPAT_CHUNK_SIZE = 64 * 1024
+
+# Package parts a file needs to count as a DOCX
+_REQUIRED_PARTS = ('[Content_Types].xml', 'word/document.xml')
+
+# Signature every ZIP package starts with (the first local file header)
+_ZIP_LOCAL_HEADER = b'PK\x03\x04'
+
+@functools.lru_cache(maxsize=256)
+def _docx_validity(path: str, mtime_ns: int, size: int) -> bool:
+    """Whether a DOCX package is well formed; keyed on mtime and size so an
+    edited file is checked again"""
+    # Triage on the first four bytes; only files that look like a ZIP pay for
+    # reading the central directory
+    with open(path, 'rb') as f:
+        if f.read(4) != _ZIP_LOCAL_HEADER:
+            logger.error(f"Invalid DOCX file (not a ZIP): {path}")
+            return False
+    
+    docx_zip = DOCXExtractor._open_docx(Path(path), _REQUIRED_PARTS)
+    if docx_zip is None:
+        return False
+    docx_zip.close()
+    return True
+
 class DOCXExtractor:
     """Extract text content from DOCX files"""
     
+    # Clark-notation tags, built once rather than per element visited
+    _NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    _W_P = f'{{{_NS}}}p'
+    # The same tags as expat reports them with namespace_separator='|'
+    _EXPAT_P = f'{_NS}|p'
+    _EXPAT_T = f'{_NS}|t'
+    # Run text of a paragraph, collected by libxml2 in one call rather than a
+    # Python loop over each w:t element
+    _RUN_TEXT = LET.XPath('.//w:t/text()', namespaces={'w': _NS},
+                          smart_strings=False) if _HAVE_LXML else None
+    
     def __init__(self):
         self.namespace = {
-            'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+            'w': self._NS
         }
     def extract_text(self, file_path: str) -> Dict[str, Any]:
         """
@@ -67,50 +116,121 @@ class DOCXExtractor:
     def _extract_text_from_docx(self, file_path: Path) -> str:
         """Extract text using XML parsing of DOCX structure"""
         try:
-            text_parts = []
+            docx_zip = self._open_docx(file_path)
+            if docx_zip is None:
+                return ""
             
-            with zipfile.ZipFile(file_path, 'r') as docx_zip:
-                # Check if document.xml exists (main content)
-                if 'word/document.xml' not in docx_zip.namelist():
-                    logger.error("No document.xml found in DOCX file")
-                    return ""
-                
-                # Extract main document content
-                document_xml = docx_zip.read('word/document.xml')
-                root = ET.fromstring(document_xml)
-                
-                # Find all text elements
-                for text_elem in root.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'):
-                    if text_elem.text:
-                        text_parts.append(text_elem.text)
-                
-                # Add paragraph breaks
-                paragraphs = []
-                current_paragraph = []
-                
-                for para in root.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p'):
-                    para_text = ""
-                    for text_elem in para.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'):
-                        if text_elem.text:
-                            para_text += text_elem.text
+            with docx_zip:
+                # Stream the main document content instead of building the
+                # whole tree; each paragraph is discarded once its text is read
+                with docx_zip.open('word/document.xml') as document_xml:
+                    paragraphs = self._iter_paragraphs(document_xml)
                     
-                    if para_text.strip():
-                        paragraphs.append(para_text.strip())
-                
-                # Join paragraphs with double newlines
-                full_text = '\n\n'.join(paragraphs)
-                
-                return full_text
+                    # Join paragraphs with double newlines
+                    return '\n\n'.join(paragraphs)
                 
-        except zipfile.BadZipFile:
-            logger.error(f"Invalid DOCX file (corrupted ZIP): {file_path}")
-            return ""
-        except ET.ParseError as e:
+        except _XML_ERRORS as e:
             logger.error(f"XML parsing error in DOCX: {e}")
             return ""
         except Exception as e:
             logger.error(f"Unexpected error parsing DOCX: {e}")
             return ""
+    
+    @staticmethod
+    def _open_docx(file_path: Path,
+                   required_parts: Tuple[str, ...] = ('word/document.xml',)) -> Optional[zipfile.ZipFile]:
+        """
+        Open a DOCX package once for validation or extraction
+        
+        Args:
+            file_path: Path to the DOCX file
+            required_parts: Members the package must contain
+            
+        Returns:
+            The open ZipFile (the caller closes it), or None if the file is
+            not a ZIP or lacks a required part
+        """
+        try:
+            docx_zip = zipfile.ZipFile(file_path, 'r')
+        except zipfile.BadZipFile:
+            logger.error(f"Invalid DOCX file (corrupted ZIP): {file_path}")
+            return None
+        
+        for part in required_parts:
+            try:
+                docx_zip.getinfo(part)
+            except KeyError:
+                logger.error(f"No {part} found in DOCX file: {file_path}")
+                docx_zip.close()
+                return None
+        
+        return docx_zip
+    
+    def _iter_paragraphs(self, document_xml):
+        """Yield the stripped, non-empty text of each w:p in a document.xml stream"""
+        if _HAVE_LXML:
+            run_text = self._RUN_TEXT
+            # document.xml comes from an untrusted upload: no DTD loading or
+            # external entity resolution (lxml < 5 resolves them by default)
+            paragraphs = LET.iterparse(document_xml, events=('end',), tag=self._W_P,
+                                       resolve_entities=False, load_dtd=False, no_network=True)
+            for _, para in paragraphs:
+                para_text = ''.join(run_text(para)).strip()
+                if para_text:
+                    yield para_text
+                
+                # Drop the paragraph and the already-processed siblings
+                # before it so memory stays at one paragraph's subtree
+                para.clear()
+                while para.getprevious() is not None:
+                    del para.getparent()[0]
+        else:
+            yield from self._iter_paragraphs_expat(document_xml)
+    
+    def _iter_paragraphs_expat(self, document_xml):
+        """SAX-style paragraph walk with expat; no element objects are created"""
+        w_p, w_t = self._EXPAT_P, self._EXPAT_T
+        # One run buffer per open w:p (text boxes nest paragraphs) and a
+        # depth counter for w:t, whose character data may arrive in pieces
+        open_paragraphs = []
+        in_text = 0
+        finished = []
+        
+        def start(name, attrs):
+            nonlocal in_text
+            if name == w_p:
+                open_paragraphs.append([])
+            elif name == w_t:
+                in_text += 1
+        
+        def end(name):
+            nonlocal in_text
+            if name == w_p:
+                para_text = ''.join(open_paragraphs.pop()).strip()
+                if para_text:
+                    finished.append(para_text)
+            elif name == w_t:
+                in_text -= 1
+        
+        def characters(data):
+            if in_text and open_paragraphs:
+                open_paragraphs[-1].append(data)
+        
+        parser = expat.ParserCreate(namespace_separator='|')
+        parser.buffer_text = True
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = characters
+        
+        while True:
+            chunk = document_xml.read(_EXPAT_CHUNK_SIZE)
+            parser.Parse(chunk, not chunk)
+            if finished:
+                yield from finished
+                finished.clear()
+            if not chunk:
+                break
+    
     def is_valid_docx(self, file_path: str) -> bool:
         """Check if file is a valid DOCX file"""
         try:
@@ -122,20 +242,20 @@ class DOCXExtractor:
             if not path_obj.suffix.lower() == '.docx':
                 return False
             
-            # Check if it's a valid ZIP file with DOCX structure
-            with zipfile.ZipFile(path_obj, 'r') as docx_zip:
-                required_files = ['[Content_Types].xml', 'word/document.xml']
-                for required_file in required_files:
-                    if required_file not in docx_zip.namelist():
-                        return False
-            
-            return True
+            # Check if it's a valid ZIP file with DOCX structure; the result is
+            # cached so validate-then-extract pipelines only open it once more
+            stat = path_obj.stat()
+            return _docx_validity(str(path_obj.resolve()), stat.st_mtime_ns, stat.st_size)
             
         except (zipfile.BadZipFile, FileNotFoundError, PermissionError):
             return False
         except Exception:
             return False
 
+# Shared instance for the convenience function; the extractor holds no
+# per-file state
+_docx_extractor = DOCXExtractor()
+
 def extract_docx_text(file_path: str) -> str:
     """
     Convenience function to extract text from DOCX file
@@ -146,8 +266,7 @@ def extract_docx_text(file_path: str) -> str:
     Returns:
         Extracted text content
     """
-    extractor = DOCXExtractor()
-    result = extractor.extract_text(file_path)
+    result = _docx_extractor.extract_text(file_path)
     return result.get("text", "")
 
 if __name__ == "__main__":
@@ -2,12 +2,17 @@
 File loading utilities for scanning and discovering documents
 """
 import os
+import stat as _stat
+import sys
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, Iterable, Optional
+from dataclasses import dataclass
 import mimetypes
-from datetime import datetime
 import fnmatch
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Import configuration
 try:
@@ -20,6 +25,41 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Threads for per-file metadata; stat releases the GIL, so a cold scan
+# overlaps its syscalls instead of waiting on each one in turn
+_FILE_INFO_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Process identity for deriving readability from stat bits; None on Windows,
+# where os.access(R_OK) only reports existence anyway
+_EUID = os.geteuid() if hasattr(os, 'geteuid') else None
+_GROUPS = frozenset(os.getgroups()) | {os.getegid()} if _EUID is not None else frozenset()
+
+def _is_readable(st: os.stat_result) -> bool:
+    """Read permission from an existing stat result, saving an os.access call per file"""
+    if _EUID is None or _EUID == 0:
+        return True
+    if st.st_uid == _EUID:
+        return bool(st.st_mode & _stat.S_IRUSR)
+    if st.st_gid in _GROUPS:
+        return bool(st.st_mode & _stat.S_IRGRP)
+    return bool(st.st_mode & _stat.S_IROTH)
+
+@dataclass(frozen=True, slots=True)
+class FileInfo:
+    """Metadata for a discovered file; slotted so large scans stay compact"""
+    filepath: str
+    filename: str
+    extension: str
+    size_bytes: int
+    size_mb: float
+    # POSIX timestamps (datetime.fromtimestamp converts them)
+    modified_time: float = 0.0
+    created_time: float = 0.0
+    mime_type: Optional[str] = None
+    parent_directory: str = ""
+    is_readable: bool = False
+    error: Optional[str] = None
+
 class FileLoader:
     """
     Handles discovery and loading of files from the file system
@@ -36,32 +76,34 @@ class FileLoader:
             supported_extensions = list(SUPPORTED_EXTENSIONS)
         
         self.supported_extensions = [ext.lower() for ext in supported_extensions]
+        # Set form for the per-file membership test
+        self._supported_extensions_set = frozenset(self.supported_extensions)
         self.exclude_patterns = list(EXCLUDE_PATTERNS)
         self.exclude_directories = list(EXCLUDE_DIRECTORIES)
+        
+        # All exclude patterns folded into one compiled regex, so each file is
+        # checked with a single match instead of one fnmatch per pattern
+        self._exclude_re = re.compile('|'.join(
+            f"(?:{fnmatch.translate(pattern.lower())})" for pattern in self.exclude_patterns
+        )) if self.exclude_patterns else None
+        # Directory names are matched exactly and case-insensitively
+        self._exclude_dirs_set = frozenset(d.lower() for d in self.exclude_directories)
         logger.info(f"FileLoader initialized with extensions: {self.supported_extensions}")
     
     def _should_exclude_file(self, file_path: Path) -> bool:
         """Check if a file should be excluded based on patterns"""
-        filename = file_path.name
-        
         # Check against exclude patterns
-        for pattern in self.exclude_patterns:
-            if fnmatch.fnmatch(filename.lower(), pattern.lower()):
-                return True
-        
-        return False
+        return self._exclude_re is not None and self._exclude_re.match(file_path.name.lower()) is not None
     
     def _should_exclude_directory(self, dir_path: Path) -> bool:
         """Check if a directory should be excluded"""
-        dirname = dir_path.name.lower()
-        
-        for exclude_dir in self.exclude_directories:
-            if exclude_dir.lower() in dirname:
-                return True
-        
-        return False
+        return self._should_exclude_dirname(dir_path.name)
+    
+    def _should_exclude_dirname(self, dirname: str) -> bool:
+        """Check a directory name against the excluded directories"""
+        return dirname.lower() in self._exclude_dirs_set
     
-    def scan_directory(self, directory_path: str, recursive: bool = True) -> List[Dict[str, Any]]:
+    def scan_directory(self, directory_path: str, recursive: bool = True) -> List[FileInfo]:
         """
         Scan a directory for supported files
         
@@ -70,7 +112,24 @@ class FileLoader:
             recursive: Whether to scan subdirectories
             
         Returns:
-            List of file information dictionaries
+            List of FileInfo records
+        """
+        return list(self.scan_directory_iter(directory_path, recursive))
+    
+    def scan_directory_iter(self, directory_path: str,
+                            recursive: bool = True) -> Generator[FileInfo, None, None]:
+        """
+        Scan a directory for supported files, yielding each as it is found
+        
+        Consumers can start on the first file before the walk finishes, and
+        memory does not grow with the number of files.
+        
+        Args:
+            directory_path: Path to the directory to scan
+            recursive: Whether to scan subdirectories
+            
+        Yields:
+            FileInfo records
         """
         directory = Path(directory_path)
         if not directory.exists():
@@ -79,31 +138,55 @@ class FileLoader:
         if not directory.is_dir():
             raise ValueError(f"Path is not a directory: {directory_path}")
         
-        files = []
+        found = 0
         
         try:
-            if recursive:
-                pattern = "**/*"
-            else:
-                pattern = "*"
+            candidates = (
+                file_path for file_path in self._walk(directory, recursive)
+                if self._is_supported_file(file_path) and not self._should_exclude_file(file_path)
+            )
             
-            for file_path in directory.glob(pattern):
-                # Skip if any parent directory should be excluded
-                if any(self._should_exclude_directory(parent) for parent in file_path.parents):
-                    continue
-                    
-                if file_path.is_file() and self._is_supported_file(file_path) and not self._should_exclude_file(file_path):
-                    file_info = self._get_file_info(file_path)
-                    files.append(file_info)
+            for file_info in self._iter_files_info(candidates):
+                found += 1
+                yield file_info
             
-            logger.info(f"Found {len(files)} supported files in {directory_path}")
-            return files
+            logger.info(f"Found {found} supported files in {directory_path}")
             
         except Exception as e:
             logger.error(f"Error scanning directory {directory_path}: {str(e)}")
             raise
     
-    def scan_files(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+    def _walk(self, directory: Path, recursive: bool) -> Generator[Path, None, None]:
+        """
+        Yield the files under a directory, pruning excluded directories
+        
+        Excluded directories are never opened, so nothing beneath e.g.
+        node_modules or .git is listed. Symlinked directories are not followed.
+        """
+        pending = [str(directory)]
+        
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as entries:
+                    subdirectories = []
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if recursive and not self._should_exclude_dirname(entry.name):
+                                    subdirectories.append(entry.path)
+                            elif entry.is_file():
+                                yield Path(entry.path)
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.warning(f"Cannot read directory {current}: {str(e)}")
+                continue
+            
+            # Reversed so subdirectories are visited in listing order
+            pending.extend(reversed(subdirectories))
+    
+    def scan_files(self, file_paths: List[str]) -> List[FileInfo]:
         """
         Process a list of specific file paths
         
@@ -111,7 +194,7 @@ class FileLoader:
             file_paths: List of file paths to process
             
         Returns:
-            List of file information dictionaries for valid files
+            List of FileInfo records for valid files
         """
         files = []
         
@@ -134,9 +217,21 @@ class FileLoader:
     
     def _is_supported_file(self, file_path: Path) -> bool:
         """Check if a file has a supported extension"""
-        return file_path.suffix.lower() in self.supported_extensions
+        return file_path.suffix.lower() in self._supported_extensions_set
+    
+    def _iter_files_info(self, file_paths: Iterable[Path]) -> Generator[FileInfo, None, None]:
+        """Collect file information on a thread pool, in order, with a bounded number in flight"""
+        with ThreadPoolExecutor(max_workers=_FILE_INFO_WORKERS) as executor:
+            in_flight = deque()
+            for file_path in file_paths:
+                in_flight.append(executor.submit(self._get_file_info, file_path))
+                if len(in_flight) >= _FILE_INFO_WORKERS * 4:
+                    yield in_flight.popleft().result()
+            
+            while in_flight:
+                yield in_flight.popleft().result()
     
-    def _get_file_info(self, file_path: Path) -> Dict[str, Any]:
+    def _get_file_info(self, file_path: Path) -> FileInfo:
         """
         Extract metadata information from a file
         
@@ -144,7 +239,7 @@ class FileLoader:
             file_path: Path to the file
             
         Returns:
-            Dictionary with file information
+            FileInfo for the file
         """
         try:
             stat = file_path.stat()
@@ -152,41 +247,42 @@ class FileLoader:
             # Get MIME type
             mime_type, _ = mimetypes.guess_type(str(file_path))
             
-            file_info = {
-                'filepath': str(file_path.absolute()),
-                'filename': file_path.name,
-                'extension': file_path.suffix.lower(),
-                'size_bytes': stat.st_size,
-                'size_mb': round(stat.st_size / (1024 * 1024), 2),
-                'modified_time': datetime.fromtimestamp(stat.st_mtime),
-                'created_time': datetime.fromtimestamp(stat.st_ctime),
-                'mime_type': mime_type,
-                'parent_directory': str(file_path.parent),
-                'is_readable': os.access(file_path, os.R_OK)
-            }
-            
-            return file_info
+            # Extensions, directories and MIME types repeat across a scan, so
+            # interning stores each distinct value once
+            return FileInfo(
+                filepath=str(file_path.absolute()),
+                filename=file_path.name,
+                extension=sys.intern(file_path.suffix.lower()),
+                size_bytes=stat.st_size,
+                size_mb=round(stat.st_size / (1024 * 1024), 2),
+                # POSIX timestamps; building datetimes per file dominated scans
+                modified_time=stat.st_mtime,
+                created_time=stat.st_ctime,
+                mime_type=sys.intern(mime_type) if mime_type else None,
+                parent_directory=sys.intern(str(file_path.parent)),
+                is_readable=_is_readable(stat)
+            )
             
         except Exception as e:
             logger.error(f"Error getting file info for {file_path}: {str(e)}")
             # Return minimal info on error
-            return {
-                'filepath': str(file_path.absolute()),
-                'filename': file_path.name,
-                'extension': file_path.suffix.lower(),
-                'size_bytes': 0,
-                'size_mb': 0,
-                'error': str(e)
-            }
+            return FileInfo(
+                filepath=str(file_path.absolute()),
+                filename=file_path.name,
+                extension=file_path.suffix.lower(),
+                size_bytes=0,
+                size_mb=0,
+                error=str(e)
+            )
     
-    def filter_by_size(self, files: List[Dict[str, Any]], 
+    def filter_by_size(self, files: List[FileInfo], 
                       min_size_mb: float = 0.001, 
-                      max_size_mb: float = 100) -> List[Dict[str, Any]]:
+                      max_size_mb: float = 100) -> List[FileInfo]:
         """
         Filter files by size constraints
         
         Args:
-            files: List of file information dictionaries
+            files: List of FileInfo records
             min_size_mb: Minimum file size in MB
             max_size_mb: Maximum file size in MB
             
@@ -196,23 +292,23 @@ class FileLoader:
         filtered = []
         
         for file_info in files:
-            size_mb = file_info.get('size_mb', 0)
+            size_mb = file_info.size_mb
             
             if min_size_mb <= size_mb <= max_size_mb:
                 filtered.append(file_info)
             else:
-                logger.debug(f"Filtered out {file_info['filename']} (size: {size_mb}MB)")
+                logger.debug(f"Filtered out {file_info.filename} (size: {size_mb}MB)")
         
         logger.info(f"Size filter: {len(filtered)}/{len(files)} files passed")
         return filtered
     
-    def filter_by_extension(self, files: List[Dict[str, Any]], 
-                           extensions: List[str]) -> List[Dict[str, Any]]:
+    def filter_by_extension(self, files: List[FileInfo], 
+                           extensions: List[str]) -> List[FileInfo]:
         """
         Filter files by specific extensions
         
         Args:
-            files: List of file information dictionaries
+            files: List of FileInfo records
             extensions: List of extensions to keep (e.g., ['.pdf', '.txt'])
             
         Returns:
@@ -222,18 +318,18 @@ class FileLoader:
         filtered = []
         
         for file_info in files:
-            if file_info.get('extension', '').lower() in extensions_lower:
+            if file_info.extension in extensions_lower:
                 filtered.append(file_info)
         
         logger.info(f"Extension filter: {len(filtered)}/{len(files)} files passed")
         return filtered
     
-    def get_summary(self, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def get_summary(self, files: List[FileInfo]) -> Dict[str, Any]:
         """
         Generate a summary of the file collection
         
         Args:
-            files: List of file information dictionaries
+            files: List of FileInfo records
             
         Returns:
             Summary statistics
@@ -247,24 +343,29 @@ class FileLoader:
                 'smallest_file': None
             }
         
-        # Calculate statistics
-        total_size = sum(f.get('size_mb', 0) for f in files)
+        # Calculate statistics in a single pass
+        total_size = 0.0
         extensions = {}
+        largest_file = smallest_file = None
         
         for file_info in files:
-            ext = file_info.get('extension', 'unknown')
-            extensions[ext] = extensions.get(ext, 0) + 1
-        
-        # Find largest and smallest files
-        files_with_size = [f for f in files if 'size_mb' in f and f['size_mb'] > 0]
-        largest_file = max(files_with_size, key=lambda x: x['size_mb']) if files_with_size else None
-        smallest_file = min(files_with_size, key=lambda x: x['size_mb']) if files_with_size else None
+            size_mb = file_info.size_mb
+            total_size += size_mb
+            extensions[file_info.extension] = extensions.get(file_info.extension, 0) + 1
+            
+            # Largest and smallest among files with a known size; ties keep
+            # the first file seen
+            if size_mb > 0:
+                if largest_file is None or size_mb > largest_file.size_mb:
+                    largest_file = file_info
+                if smallest_file is None or size_mb < smallest_file.size_mb:
+                    smallest_file = file_info
         
         return {
             'total_files': len(files),
             'total_size_mb': round(total_size, 2),
             'extensions': extensions,
-            'largest_file': largest_file['filename'] if largest_file else None,
-            'smallest_file': smallest_file['filename'] if smallest_file else None,
+            'largest_file': largest_file.filename if largest_file else None,
+            'smallest_file': smallest_file.filename if smallest_file else None,
             'average_size_mb': round(total_size / len(files), 2) if files else 0
         }
@@ -3,17 +3,26 @@ Logging configuration for the Ptaḥ backend
 """
 import logging
 import logging.config
-import os
 from pathlib import Path
 
+# Set once setup_logging has run; the entrypoint configures logging exactly
+# once and later calls (reloads, tests importing the app) are no-ops
+_logging_configured = False
+
 def setup_logging(log_level: str = "INFO", log_file: str = None):
     """
     Set up logging configuration for the application
     
+    Called by the application entrypoint; importing this module no longer
+    configures logging as a side effect.
+    
     Args:
         log_level: The logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Optional log file path. If None, logs to console only.
     """
+    global _logging_configured
+    if _logging_configured:
+        return
     
     # Create logs directory if needed
     if log_file:
@@ -97,6 +106,7 @@ def setup_logging(log_level: str = "INFO", log_file: str = None):
     
     # Apply the configuration
     logging.config.dictConfig(config)
+    _logging_configured = True
     
     # Log the setup
     logger = logging.getLogger(__name__)
@@ -107,10 +117,3 @@ def setup_logging(log_level: str = "INFO", log_file: str = None):
 def get_logger(name: str) -> logging.Logger:
     """Get a logger with the given name"""
     return logging.getLogger(name)
-
-# Default setup for development
-if os.getenv("ENVIRONMENT") != "production":
-    setup_logging(
-        log_level=os.getenv("LOG_LEVEL", "INFO"),
-        log_file=os.getenv("LOG_FILE")
-    )
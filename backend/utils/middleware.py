@@ -3,22 +3,75 @@ Security and rate limiting middleware for FastAPI
 """
 import time
 import logging
-from typing import Dict, Optional, Callable
-from fastapi import Request, Response, HTTPException
+import functools
+from typing import Dict, List, Optional, Callable, Tuple
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-import hashlib
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import ipaddress
+import re
 
 from utils.sanitization import check_rate_limit
 
 logger = logging.getLogger(__name__)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+# Forwarded IP headers, lowercased as ASGI delivers them, mapped to their
+# order of trust
+_FORWARDED_HEADERS = {
+    b"x-forwarded-for": 0,
+    b"x-real-ip": 1,
+    b"cf-connecting-ip": 2,  # Cloudflare
+    b"x-forwarded": 3
+}
+
+# Health checks: no pattern checks, rate limiting or request logging, only
+# the blocked-IP check and the security headers
+_EXCLUDED_PATHS = frozenset({"/health"})
+
+# Longest combined path, query string and User-Agent whose verdict is cached;
+# bounds the cache to a few MB however long the request values get
+_MAX_CACHED_VERDICT_KEY = 512
+
+@functools.lru_cache(maxsize=8192)
+def _classify_ip(ip: str) -> Tuple[Optional[str], bool]:
+    """
+    Parse an address once per distinct string
+    
+    Returns:
+        (canonical address or None if invalid, whether it is private or loopback)
+    """
+    try:
+        parsed_ip = ipaddress.ip_address(ip)
+    except ValueError:
+        return None, False
+    return str(parsed_ip), parsed_ip.is_private or parsed_ip.is_loopback
+
+def _substring_union(needles) -> re.Pattern:
+    """Compile literal substrings into one alternation, scanned in a single pass"""
+    return re.compile("|".join(re.escape(needle) for needle in needles))
+
+class SecurityMiddleware:
     """
     Comprehensive security middleware
+    
+    Plain ASGI rather than BaseHTTPMiddleware, so requests pass through
+    without an extra task or Request/Response wrappers
     """
     
+    # Suspicious substrings per request field (matched against lowercased
+    # values); each field keeps its own list so e.g. "bot" in a path is fine
+    _SUSPICIOUS_PATHS = _substring_union([
+        "/admin", "/.env", "/wp-admin", "/phpmyadmin",
+        "/config", "/backup", "/test", "/debug"
+    ])
+    _SUSPICIOUS_AGENTS = _substring_union([
+        "bot", "crawler", "spider", "scraper", "scanner",
+        "sqlmap", "nikto", "nmap", "masscan"
+    ])
+    _SQL_PATTERNS = _substring_union([
+        "union select", "or 1=1", "drop table", "insert into",
+        "delete from", "update set", "exec(", "script>"
+    ])
+    
     def __init__(self, 
                  app,
                  enable_rate_limiting: bool = True,
@@ -26,7 +79,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                  max_requests_per_minute: int = 60,
                  blocked_ips: Optional[set] = None,
                  allowed_origins: Optional[list] = None):
-        super().__init__(app)
+        self.app = app
         self.enable_rate_limiting = enable_rate_limiting
         self.max_requests_per_hour = max_requests_per_hour
         self.max_requests_per_minute = max_requests_per_minute
@@ -41,21 +94,47 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             "Referrer-Policy": "strict-origin-when-cross-origin",
             "Content-Security-Policy": "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline';"
         }
+        # Encoded once for splicing into each http.response.start message
+        self._security_headers_raw = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in self.security_headers.items()
+        ]
+        # Verdicts for recently seen (path, query, User-Agent) combinations;
+        # scanner floods and polling clients repeat the same few. Only short
+        # combinations are cached (see _MAX_CACHED_VERDICT_KEY)
+        self._suspicious_verdict = functools.lru_cache(maxsize=8192)(self._match_suspicious)
     
-    def _get_client_ip(self, request: Request) -> str:
+    @staticmethod
+    def _read_headers(scope: Scope) -> Tuple[List[Optional[bytes]], bytes]:
+        """
+        Pick the headers the security checks need out of the raw ASGI list
+        
+        One pass over scope["headers"]; only the values that are used get
+        decoded later. The first occurrence of a repeated header wins.
+        
+        Returns:
+            (forwarded IP header values in order of trust, User-Agent value)
+        """
+        forwarded = [None] * len(_FORWARDED_HEADERS)
+        user_agent = None
+        
+        for name, value in scope["headers"]:
+            priority = _FORWARDED_HEADERS.get(name)
+            if priority is not None:
+                if forwarded[priority] is None:
+                    forwarded[priority] = value
+            elif name == b"user-agent" and user_agent is None:
+                user_agent = value
+        
+        return forwarded, user_agent or b""
+    
+    def _get_client_ip(self, forwarded: List[Optional[bytes]], scope: Scope) -> str:
         """Get the client IP address with improved IPv6 support"""
         # Check for forwarded IP headers (in order of trust)
-        forwarded_headers = [
-            "X-Forwarded-For",
-            "X-Real-IP",
-            "CF-Connecting-IP",  # Cloudflare
-            "X-Forwarded"
-        ]
-        
-        for header in forwarded_headers:
-            if header in request.headers:
+        for header_value in forwarded:
+            if header_value is not None:
                 # Handle comma-separated IPs (X-Forwarded-For can have multiple)
-                ip_list = request.headers[header].split(',')
+                ip_list = header_value.decode("latin-1").split(',')
                 for ip in ip_list:
                     ip = ip.strip()
                     # Remove port if present (for IPv6: [::1]:8080 -> ::1)
@@ -64,88 +143,130 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     elif ':' in ip and not ip.count(':') > 1:  # IPv4 with port
                         ip = ip.split(':')[0]
                     
-                    try:
-                        # Validate IP address (supports both IPv4 and IPv6)
-                        parsed_ip = ipaddress.ip_address(ip)
-                        # Skip private/loopback addresses in forwarded headers
-                        if not (parsed_ip.is_private or parsed_ip.is_loopback):
-                            return str(parsed_ip)
-                        elif len(ip_list) == 1:  # If only one IP, use it even if private
-                            return str(parsed_ip)
-                    except ValueError:
+                    # Validate IP address (supports both IPv4 and IPv6); the
+                    # same few addresses repeat, so results are cached
+                    canonical_ip, is_internal = _classify_ip(ip)
+                    if canonical_ip is None:
                         continue
+                    # Skip private/loopback addresses in forwarded headers
+                    if not is_internal:
+                        return canonical_ip
+                    elif len(ip_list) == 1:  # If only one IP, use it even if private
+                        return canonical_ip
         
         # Fallback to direct connection
-        client_host = request.client.host if request.client else "unknown"
-        if client_host != "unknown":
-            try:
-                # Validate the direct connection IP
-                ipaddress.ip_address(client_host)
-                return client_host
-            except ValueError:
-                pass
+        client = scope.get("client")
+        client_host = client[0] if client else "unknown"
+        # Validate the direct connection IP
+        if client_host != "unknown" and _classify_ip(client_host)[0] is not None:
+            return client_host
         
         return "unknown"
     
-    def _is_suspicious_request(self, request: Request) -> bool:
+    def _match_suspicious(self, path: str, query_string: bytes, user_agent: bytes) -> bool:
+        """Run the suspicious-pattern checks on raw request values"""
+        # Check for suspicious paths
+        if self._SUSPICIOUS_PATHS.search(path.lower()):
+            return True
+        
+        # Check for suspicious user agents
+        if self._SUSPICIOUS_AGENTS.search(user_agent.decode("latin-1").lower()):
+            return True
+        
+        # Check for SQL injection patterns in query parameters
+        if self._SQL_PATTERNS.search(query_string.decode("latin-1").lower()):
+            return True
+        
+        return False
+    
+    def _is_suspicious_request(self, user_agent: bytes, scope: Scope) -> bool:
         """Check if request shows suspicious patterns"""
         try:
-            # Check for suspicious paths
-            suspicious_paths = [
-                "/admin", "/.env", "/wp-admin", "/phpmyadmin",
-                "/config", "/backup", "/test", "/debug"
-            ]
-            
-            if any(path in str(request.url.path).lower() for path in suspicious_paths):
-                return True
-            
-            # Check for suspicious user agents
-            user_agent = request.headers.get("User-Agent", "").lower()
-            suspicious_agents = [
-                "bot", "crawler", "spider", "scraper", "scanner",
-                "sqlmap", "nikto", "nmap", "masscan"
-            ]
-            
-            if any(agent in user_agent for agent in suspicious_agents):
-                return True
-            
-            # Check for SQL injection patterns in query parameters
-            query_string = str(request.url.query).lower()
-            sql_patterns = [
-                "union select", "or 1=1", "drop table", "insert into",
-                "delete from", "update set", "exec(", "script>"
-            ]
-            
-            if any(pattern in query_string for pattern in sql_patterns):
-                return True
-            
-            return False
+            path = scope["path"]
+            query_string = scope.get("query_string", b"")
+            if len(path) + len(query_string) + len(user_agent) > _MAX_CACHED_VERDICT_KEY:
+                # Long values are rarely repeated and would pin large keys
+                return self._match_suspicious(path, query_string, user_agent)
+            return self._suspicious_verdict(path, query_string, user_agent)
             
         except Exception as e:
             logger.error(f"Error checking suspicious request: {str(e)}")
             return False
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def _deny_blocked(self, client_ip: str, scope: Scope, receive: Receive, send: Send) -> None:
+        """Answer a request from a blocked IP with 403"""
+        logger.warning(f"Blocked IP attempted access: {client_ip}")
+        response = JSONResponse(
+            status_code=403,
+            content={"detail": "Access denied"}
+        )
+        await response(scope, receive, send)
+    
+    def _with_security_headers(self, send: Send) -> Send:
+        """Wrap send so the response start carries the security headers"""
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *self._security_headers_raw]
+            await send(message)
+        return send_wrapper
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process the request through security checks"""
-        start_time = time.time()
-        client_ip = self._get_client_ip(request)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        if scope["path"] in _EXCLUDED_PATHS:
+            # The client IP is only worked out when there is a block list
+            if self.blocked_ips:
+                client_ip = self._get_client_ip(self._read_headers(scope)[0], scope)
+                if client_ip in self.blocked_ips:
+                    await self._deny_blocked(client_ip, scope, receive, send)
+                    return
+            await self.app(scope, receive, self._with_security_headers(send))
+            return
+        
+        start_ns = time.perf_counter_ns()
+        forwarded, user_agent = self._read_headers(scope)
+        client_ip = self._get_client_ip(forwarded, scope)
+        response_started = False
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                process_time = (time.perf_counter_ns() - start_ns) / 1e9
+                
+                # Add security headers and a timing header for debugging
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    *self._security_headers_raw,
+                    (b"x-process-time", f"{process_time:.6f}".encode("ascii"))
+                ]
+                
+                # Log successful request
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        f"{scope['method']} {scope['path']} - {client_ip} - "
+                        f"{message['status']} - {process_time:.3f}s"
+                    )
+            await send(message)
         
         try:
             # Check if IP is blocked
             if client_ip in self.blocked_ips:
-                logger.warning(f"Blocked IP attempted access: {client_ip}")
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "Access denied"}
-                )
+                await self._deny_blocked(client_ip, scope, receive, send)
+                return
             
             # Check for suspicious requests
-            if self._is_suspicious_request(request):
-                logger.warning(f"Suspicious request from {client_ip}: {request.url}")
-                return JSONResponse(
+            if self._is_suspicious_request(user_agent, scope):
+                logger.warning(f"Suspicious request from {client_ip}: {scope['path']}")
+                response = JSONResponse(
                     status_code=400,
                     content={"detail": "Request not allowed"}
                 )
+                await response(scope, receive, send)
+                return
             
             # Rate limiting
             if self.enable_rate_limiting:
@@ -156,11 +277,13 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     3600
                 ):
                     logger.warning(f"Hourly rate limit exceeded for {client_ip}")
-                    return JSONResponse(
+                    response = JSONResponse(
                         status_code=429,
                         content={"detail": "Hourly rate limit exceeded"},
                         headers={"Retry-After": "3600"}
                     )
+                    await response(scope, receive, send)
+                    return
                 
                 # Check per-minute rate limit
                 if not check_rate_limit(
@@ -169,74 +292,66 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     60
                 ):
                     logger.warning(f"Per-minute rate limit exceeded for {client_ip}")
-                    return JSONResponse(
+                    response = JSONResponse(
                         status_code=429,
                         content={"detail": "Rate limit exceeded"},
                         headers={"Retry-After": "60"}
                     )
+                    await response(scope, receive, send)
+                    return
             
             # Process the request
-            response = await call_next(request)
-            
-            # Add security headers
-            for header, value in self.security_headers.items():
-                response.headers[header] = value
-            
-            # Add timing header for debugging
-            process_time = time.time() - start_time
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            # Log successful request
-            logger.info(
-                f"{request.method} {request.url.path} - {client_ip} - "
-                f"{response.status_code} - {process_time:.3f}s"
-            )
-            
-            return response
+            await self.app(scope, receive, send_wrapper)
             
         except Exception as e:
             logger.error(f"Security middleware error: {str(e)}")
+            if response_started:
+                # Too late to replace the response; let the server close it
+                raise
             # Don't expose internal errors
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=500,
                 content={"detail": "Internal server error"}
             )
+            await response(scope, receive, send)
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """
     Middleware for detailed request logging
     """
     
-    def __init__(self, app, log_body: bool = False, max_body_size: int = 1024):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, log_body: bool = False, max_body_size: int = 1024):
+        self.app = app
         self.log_body = log_body
         self.max_body_size = max_body_size
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Log request details"""
-        start_time = time.time()
-        client_ip = request.client.host if request.client else "unknown"
-        
-        # Log request
-        logger.info(
-            f"Request: {request.method} {request.url} from {client_ip}"
-        )
+        # Nothing to do when INFO records would be dropped anyway
+        if scope["type"] != "http" or not logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
         
-        # Process request first to avoid consuming body stream
-        response = await call_next(request)
+        start_ns = time.perf_counter_ns()
         
-        # Log response
-        process_time = time.time() - start_time
-        logger.info(
-            f"Response: {response.status_code} - {process_time:.3f}s"
-        )
-        
-        # Note: Request body logging has been moved after response processing
-        # to avoid consuming the body stream and breaking downstream handlers.
-        # For detailed body logging, consider using a different approach or
-        # implementing it at the application level.
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # One line per request once the status is known; the message
+                # is only built here, never for filtered-out levels
+                process_time = (time.perf_counter_ns() - start_ns) / 1e9
+                client = scope.get("client")
+                query_string = scope.get("query_string", b"").decode("latin-1")
+                logger.info(
+                    f"Request: {scope['method']} {scope['path']}"
+                    f"{'?' + query_string if query_string else ''} "
+                    f"from {client[0] if client else 'unknown'} - "
+                    f"{message['status']} - {process_time:.3f}s"
+                )
+            await send(message)
         
-        return response
+        # The body stream is passed through untouched, so downstream handlers
+        # can still read it; body logging belongs at the application level
+        await self.app(scope, receive, send_wrapper)
 
 def create_security_middleware(
     enable_rate_limiting: bool = True,
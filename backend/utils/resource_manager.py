@@ -4,6 +4,7 @@ Database connection pool and resource management utilities
 import sqlite3
 import threading
 import contextlib
+import queue
 import logging
 from typing import Generator
 from pathlib import Path
@@ -20,8 +21,13 @@ class DatabasePool:
     def __init__(self, database_path: str, max_connections: int = 10):
         self.database_path = Path(database_path)
         self.max_connections = max_connections
-        self._pool = []
-        self._in_use = set()
+        # Idle connections, most recently returned first so the warmest one
+        # is reused; the semaphore caps connections handed out at once
+        self._pool = queue.LifoQueue(maxsize=max_connections)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        # Every open connection, idle or checked out; only touched when a
+        # connection is created or closed
+        self._connections = set()
         self._lock = threading.Lock()
         self._created_connections = 0
         
@@ -36,17 +42,27 @@ class DatabasePool:
         conn = sqlite3.connect(
             str(self.database_path),
             timeout=30.0,  # 30 second timeout
-            check_same_thread=False
+            check_same_thread=False,
+            cached_statements=256  # Keep prepared statements for repeated queries
         )
+        # Rows support both index and name access, so callers never set this per query
+        conn.row_factory = sqlite3.Row
         
-        # Enable foreign keys and optimize performance
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.execute("PRAGMA journal_mode = WAL")
-        conn.execute("PRAGMA synchronous = NORMAL")
-        conn.execute("PRAGMA cache_size = -64000")  # 64MB cache
-        conn.execute("PRAGMA temp_store = MEMORY")
+        # Enable foreign keys and optimize performance, in one script rather
+        # than a cursor per statement; mmap lets hot pages be read without
+        # a read() call per page
+        conn.executescript("""
+            PRAGMA foreign_keys = ON;
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA cache_size = -64000;  -- 64MB cache
+            PRAGMA temp_store = MEMORY;
+            PRAGMA mmap_size = 268435456;  -- 256MB
+        """)
         
-        self._created_connections += 1
+        with self._lock:
+            self._connections.add(conn)
+            self._created_connections += 1
         logger.debug(f"Created new database connection ({self._created_connections} total)")
         return conn
         
@@ -59,25 +75,16 @@ class DatabasePool:
             with pool.get_connection() as conn:
                 conn.execute("SELECT * FROM table")
         """
+        # Wait for a free slot rather than opening connections past the cap
+        if not self._slots.acquire(timeout=30.0):
+            raise sqlite3.OperationalError("Timed out waiting for a pooled database connection")
+        
         conn = None
         try:
-            with self._lock:
-                if self._pool:
-                    conn = self._pool.pop()
-                elif self._created_connections < self.max_connections:
-                    conn = self._create_connection()
-                else:
-                    # Wait for a connection to become available
-                    logger.warning("Connection pool exhausted, waiting for available connection")
-                    
-            if conn is None:
-                # Fallback: create temporary connection
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
                 conn = self._create_connection()
-                logger.warning("Created temporary connection due to pool exhaustion")
-                
-            # Mark connection as in use
-            with self._lock:
-                self._in_use.add(conn)
                 
             yield conn
             
@@ -90,37 +97,32 @@ class DatabasePool:
                     pass
             raise
         finally:
-            if conn:
-                try:
-                    # Return connection to pool
-                    with self._lock:
-                        self._in_use.discard(conn)
-                        if len(self._pool) < self.max_connections:
-                            self._pool.append(conn)
-                        else:
-                            conn.close()
-                            self._created_connections -= 1
-                except Exception as e:
-                    logger.error(f"Error returning connection to pool: {str(e)}")
+            try:
+                # Return connection to pool, unless close_all closed it meanwhile
+                if conn is not None and conn in self._connections:
+                    self._pool.put_nowait(conn)
+            except Exception as e:
+                logger.error(f"Error returning connection to pool: {str(e)}")
+            finally:
+                self._slots.release()
                     
     def close_all(self):
         """Close all connections in the pool"""
         with self._lock:
-            # Close pooled connections
-            for conn in self._pool:
+            # Drop pooled connections
+            while True:
                 try:
-                    conn.close()
-                except:
-                    pass
-            self._pool.clear()
+                    self._pool.get_nowait()
+                except queue.Empty:
+                    break
             
-            # Close in-use connections
-            for conn in list(self._in_use):
+            # Close pooled and in-use connections
+            for conn in self._connections:
                 try:
                     conn.close()
                 except:
                     pass
-            self._in_use.clear()
+            self._connections.clear()
             
             self._created_connections = 0
             logger.info("All database connections closed")
@@ -128,9 +130,10 @@ class DatabasePool:
     def get_stats(self) -> dict:
         """Get pool statistics"""
         with self._lock:
+            pool_size = self._pool.qsize()
             return {
-                "pool_size": len(self._pool),
-                "in_use": len(self._in_use),
+                "pool_size": pool_size,
+                "in_use": len(self._connections) - pool_size,
                 "total_created": self._created_connections,
                 "max_connections": self.max_connections
             }
@@ -140,6 +143,8 @@ class ResourceManager:
     Context manager for proper resource cleanup
     """
     
+    __slots__ = ("_resources", "_cleanup_callbacks")
+    
     def __init__(self):
         self._resources = []
         self._cleanup_callbacks = []
@@ -4,12 +4,76 @@ Input sanitization and validation utilities
 import re
 import html
 import logging
-from typing import Any, Dict, List, Optional, Union
+import threading
+import functools
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
 from urllib.parse import urlparse, unquote
 import unicodedata
 
+# Hyperscan tests a whole pattern list in one DFA pass; without it the list
+# is folded into a single compiled regex alternation
+try:
+    import hyperscan
+    _HAVE_HYPERSCAN = True
+except ImportError:
+    hyperscan = None
+    _HAVE_HYPERSCAN = False
+
 logger = logging.getLogger(__name__)
 
+# str.translate tables deleting control characters, applied in one C loop;
+# text keeps tab and line breaks, filenames drop them too
+_CONTROL_CHARS = {code: None for code in range(32) if chr(code) not in '\n\r\t'}
+_FILENAME_CONTROL_CHARS = {code: None for code in range(32)}
+
+class _PatternSet:
+    """
+    Case-insensitive "does any of these patterns match" test in a single scan
+    
+    Callers only use it as a gate: when it reports a hit they still apply
+    the individual patterns, so clean input (the common case) is scanned
+    once instead of once per pattern. Hyperscan's \b, \w and \s are ASCII
+    (its Unicode mode rejects \b), which matches Python's only for ASCII
+    text, so other text goes through the regex alternation.
+    """
+    
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._union = re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
+        self._database = None
+        self._local = threading.local()
+        
+        if _HAVE_HYPERSCAN:
+            try:
+                database = hyperscan.Database()
+                database.compile(
+                    expressions=[p.encode() for p in patterns],
+                    ids=list(range(len(patterns))),
+                    flags=[hyperscan.HS_FLAG_CASELESS] * len(patterns)
+                )
+                self._database = database
+            except hyperscan.error as e:
+                logger.warning(f"Hyperscan compile failed, using regex fallback: {str(e)}")
+    
+    def search(self, text: str) -> bool:
+        """True if any pattern matches somewhere in text"""
+        if self._database is None or not text.isascii():
+            return self._union.search(text) is not None
+        
+        # Scratch space must not be shared between concurrent scans
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self._database)
+        
+        def on_match(pattern_id, start, end, flags, context):
+            return True  # stop at the first hit
+        
+        try:
+            self._database.scan(text.encode('ascii'), match_event_handler=on_match, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+
 class InputSanitizer:
     """
     Comprehensive input sanitization for security and data integrity
@@ -44,6 +108,11 @@ class InputSanitizer:
         r"\.\.%5c",
     ]
     
+    # Single-scan gates over the lists above
+    _SQL_INJECTION_SET = _PatternSet(SQL_INJECTION_PATTERNS)
+    _XSS_SET = _PatternSet(XSS_PATTERNS)
+    _PATH_TRAVERSAL_SET = _PatternSet(PATH_TRAVERSAL_PATTERNS)
+    
     @classmethod
     def sanitize_string(cls, text: str, max_length: int = 1000, allow_html: bool = False) -> str:
         """
@@ -61,11 +130,22 @@ class InputSanitizer:
             logger.warning(f"Expected string, got {type(text)}")
             return str(text)[:max_length]
         
+        text = cls._prepare_text(text, max_length, allow_html)
+        
+        # Check for suspicious patterns
+        if cls._XSS_SET.search(text):
+            text = cls._remove_xss(text)
+        
+        return text.strip()
+    
+    @classmethod
+    def _prepare_text(cls, text: str, max_length: int = 1000, allow_html: bool = False) -> str:
+        """The steps of sanitize_string that come before the XSS pattern check"""
         # Normalize Unicode characters
         text = unicodedata.normalize('NFKC', text)
         
         # Remove or escape control characters
-        text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+        text = text.translate(_CONTROL_CHARS)
         
         # Truncate to max length
         if len(text) > max_length:
@@ -76,13 +156,16 @@ class InputSanitizer:
         if not allow_html:
             text = html.escape(text)
         
-        # Check for suspicious patterns
+        return text
+    
+    @classmethod
+    def _remove_xss(cls, text: str) -> str:
+        """Delete every XSS pattern match from text"""
         for pattern in cls.XSS_PATTERNS:
             if re.search(pattern, text, re.IGNORECASE):
                 logger.warning(f"Potential XSS pattern detected: {pattern}")
                 text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-        
-        return text.strip()
+        return text
     
     @classmethod
     def sanitize_filename(cls, filename: str) -> str:
@@ -103,11 +186,12 @@ class InputSanitizer:
         
         # Normalize and remove control characters
         filename = unicodedata.normalize('NFKC', filename)
-        filename = ''.join(char for char in filename if ord(char) >= 32)
+        filename = filename.translate(_FILENAME_CONTROL_CHARS)
         
         # Remove path traversal attempts
-        for pattern in cls.PATH_TRAVERSAL_PATTERNS:
-            filename = re.sub(pattern, '', filename, flags=re.IGNORECASE)
+        if cls._PATH_TRAVERSAL_SET.search(filename):
+            for pattern in cls.PATH_TRAVERSAL_PATTERNS:
+                filename = re.sub(pattern, '', filename, flags=re.IGNORECASE)
         
         # Remove dangerous characters
         filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
@@ -145,13 +229,14 @@ class InputSanitizer:
         path = unicodedata.normalize('NFKC', path)
         
         # Check for path traversal attempts
-        for pattern in cls.PATH_TRAVERSAL_PATTERNS:
-            if re.search(pattern, path, re.IGNORECASE):
-                logger.warning(f"Path traversal attempt detected: {path}")
-                return ""
+        if cls._PATH_TRAVERSAL_SET.search(path) and any(
+            re.search(pattern, path, re.IGNORECASE) for pattern in cls.PATH_TRAVERSAL_PATTERNS
+        ):
+            logger.warning(f"Path traversal attempt detected: {path}")
+            return ""
         
         # Remove control characters but keep path separators
-        path = ''.join(char for char in path if ord(char) >= 32 or char in '\n\r\t')
+        path = path.translate(_CONTROL_CHARS)
         
         # Normalize path separators for current OS
         import os
@@ -189,10 +274,11 @@ class InputSanitizer:
         query = cls.sanitize_string(query, max_length=1000, allow_html=False)
         
         # Check for SQL injection patterns
-        for pattern in cls.SQL_INJECTION_PATTERNS:
-            if re.search(pattern, query, re.IGNORECASE):
-                logger.warning(f"Potential SQL injection detected in query: {query}")
-                query = re.sub(pattern, ' ', query, flags=re.IGNORECASE)
+        if cls._SQL_INJECTION_SET.search(query):
+            for pattern in cls.SQL_INJECTION_PATTERNS:
+                if re.search(pattern, query, re.IGNORECASE):
+                    logger.warning(f"Potential SQL injection detected in query: {query}")
+                    query = re.sub(pattern, ' ', query, flags=re.IGNORECASE)
         
         # Normalize whitespace
         query = re.sub(r'\s+', ' ', query).strip()
@@ -224,10 +310,11 @@ class InputSanitizer:
             
             # Check for suspicious patterns
             full_url = parsed.geturl()
-            for pattern in cls.XSS_PATTERNS:
-                if re.search(pattern, full_url, re.IGNORECASE):
-                    logger.warning(f"Suspicious pattern in URL: {pattern}")
-                    return ""
+            if cls._XSS_SET.search(full_url):
+                for pattern in cls.XSS_PATTERNS:
+                    if re.search(pattern, full_url, re.IGNORECASE):
+                        logger.warning(f"Suspicious pattern in URL: {pattern}")
+                        return ""
             
             return full_url
             
@@ -240,6 +327,11 @@ class InputSanitizer:
         """
         Recursively sanitize a dictionary
         
+        Nested dictionaries are walked with an explicit stack. String values
+        are prepared as they are found and checked for XSS patterns together
+        in one scan at the end; only when that scan hits are they checked
+        one by one.
+        
         Args:
             data: Input dictionary
             max_depth: Maximum recursion depth
@@ -252,26 +344,50 @@ class InputSanitizer:
             return {}
         
         sanitized = {}
+        # (container id, key or index) -> (container, key or index, prepared
+        # text); a later value for the same sanitized key replaces the entry
+        pending_text = {}
+        stack = [(data, sanitized, max_depth)]
         
-        for key, value in data.items():
-            # Sanitize key
-            clean_key = cls.sanitize_string(str(key), max_length=100)
+        while stack:
+            source, target, depth = stack.pop()
             
-            # Sanitize value based on type
-            if isinstance(value, str):
-                sanitized[clean_key] = cls.sanitize_string(value)
-            elif isinstance(value, dict):
-                sanitized[clean_key] = cls.sanitize_dict(value, max_depth - 1)
-            elif isinstance(value, list):
-                sanitized[clean_key] = [
-                    cls.sanitize_string(str(item)) if isinstance(item, str) else item
-                    for item in value[:100]  # Limit list size
-                ]
-            elif isinstance(value, (int, float, bool)) or value is None:
-                sanitized[clean_key] = value
-            else:
-                # Convert unknown types to string and sanitize
-                sanitized[clean_key] = cls.sanitize_string(str(value))
+            for key, value in source.items():
+                # Sanitize key
+                clean_key = cls.sanitize_string(str(key), max_length=100)
+                slot = (id(target), clean_key)
+                pending_text.pop(slot, None)
+                
+                # Sanitize value based on type
+                if isinstance(value, dict):
+                    if depth - 1 <= 0:
+                        logger.warning("Maximum sanitization depth reached")
+                        target[clean_key] = {}
+                    else:
+                        nested = target[clean_key] = {}
+                        stack.append((value, nested, depth - 1))
+                elif isinstance(value, list):
+                    items = target[clean_key] = value[:100]  # Limit list size
+                    for index, item in enumerate(items):
+                        if isinstance(item, str):
+                            pending_text[(id(items), index)] = (items, index, cls._prepare_text(item))
+                elif isinstance(value, (int, float, bool)) or value is None:
+                    target[clean_key] = value
+                else:
+                    # Strings as they are, unknown types converted to strings
+                    target[clean_key] = None
+                    text = value if isinstance(value, str) else str(value)
+                    pending_text[slot] = (target, clean_key, cls._prepare_text(text))
+        
+        if pending_text:
+            # A NUL separator cannot hide a match, so a clean joined batch
+            # means every string in it is clean
+            entries = pending_text.values()
+            batch_clean = not cls._XSS_SET.search('\x00'.join(text for _, _, text in entries))
+            for container, position, text in entries:
+                if not batch_clean and cls._XSS_SET.search(text):
+                    text = cls._remove_xss(text)
+                container[position] = text.strip()
         
         return sanitized
 
@@ -295,6 +411,14 @@ def validate_phone(phone: str) -> bool:
     # Check if it's all digits and reasonable length
     return cleaned.isdigit() and 7 <= len(cleaned) <= 15
 
+@functools.lru_cache(maxsize=64)
+def _normalize_extensions(extensions: Tuple[str, ...]) -> FrozenSet[str]:
+    """Lowercased extensions, each starting with '.'; callers pass the same few lists"""
+    return frozenset(
+        ext if ext.startswith('.') else f'.{ext}'
+        for ext in (e.lower().strip() for e in extensions)
+    )
+
 def validate_file_extension(filename: str, allowed_extensions: List[str]) -> bool:
     """
     Validate file extension against allowed list
@@ -309,27 +433,37 @@ def validate_file_extension(filename: str, allowed_extensions: List[str]) -> boo
     if not filename or not allowed_extensions:
         return False
     
-    file_ext = filename.lower().split('.')[-1] if '.' in filename else ''
+    file_ext = filename.rpartition('.')[2].lower() if '.' in filename else ''
     
     # Normalize extensions (ensure they start with .)
-    normalized_allowed = [
-        ext if ext.startswith('.') else f'.{ext}'
-        for ext in [e.lower().strip() for e in allowed_extensions]
-    ]
+    normalized_allowed = _normalize_extensions(tuple(allowed_extensions))
     
     return f'.{file_ext}' in normalized_allowed
 
 # Rate limiting helpers
-import threading
 import time
 
-_request_counts = {}
-_request_lock = threading.Lock()
+# Token bucket per identifier: (tokens left, last refill time, window seconds).
+# Checks are O(1) with a few floats per identifier instead of a list of
+# request timestamps. Identifiers are striped across independently locked
+# shards, so checks for different clients do not wait on one global lock
+_RATE_LIMIT_SHARDS = 32  # power of two, so a shard is a mask of the hash
+_rate_limit_shards = [
+    {'buckets': {}, 'lock': threading.Lock(), 'last_sweep': time.monotonic()}
+    for _ in range(_RATE_LIMIT_SHARDS)
+]
+
+# How often idle buckets are swept out of a shard; a bucket untouched for a
+# whole window has refilled completely, so dropping it changes nothing
+_SWEEP_INTERVAL_SECONDS = 300
 
 def check_rate_limit(identifier: str, max_requests: int = 100, window_seconds: int = 3600) -> bool:
     """
     Simple in-memory rate limiting
     
+    A token bucket holding up to max_requests tokens, refilled at
+    max_requests per window_seconds; each allowed request takes one token.
+    
     Args:
         identifier: Unique identifier (e.g., IP address, user ID)
         max_requests: Maximum requests allowed
@@ -338,21 +472,27 @@ def check_rate_limit(identifier: str, max_requests: int = 100, window_seconds: i
     Returns:
         True if request is allowed
     """
-    current_time = time.time()
+    current_time = time.monotonic()
+    rate = max_requests / window_seconds
+    shard = _rate_limit_shards[hash(identifier) & (_RATE_LIMIT_SHARDS - 1)]
     
-    with _request_lock:
-        # Clean old entries
-        cutoff_time = current_time - window_seconds
-        _request_counts[identifier] = [
-            timestamp for timestamp in _request_counts.get(identifier, [])
-            if timestamp > cutoff_time
-        ]
+    with shard['lock']:
+        buckets = shard['buckets']
+        if current_time - shard['last_sweep'] >= _SWEEP_INTERVAL_SECONDS:
+            for key in [key for key, (_, last, window) in buckets.items()
+                        if current_time - last >= window]:
+                del buckets[key]
+            shard['last_sweep'] = current_time
+        
+        # Refill for the time since the last request
+        tokens, last, _ = buckets.get(identifier, (max_requests, current_time, window_seconds))
+        tokens = min(max_requests, tokens + (current_time - last) * rate)
         
         # Check if rate limit exceeded
-        request_count = len(_request_counts.get(identifier, []))
-        if request_count >= max_requests:
+        if tokens < 1:
+            buckets[identifier] = (tokens, current_time, window_seconds)
             return False
         
-        # Add current request
-        _request_counts.setdefault(identifier, []).append(current_time)
+        # Take a token for the current request
+        buckets[identifier] = (tokens - 1, current_time, window_seconds)
         return True
@@ -5,49 +5,140 @@ Ptaḥ Simple Launcher - Basic working version (Fixed)
 import os
 import sys
 import time
+import asyncio
+import socket
+import shutil
+import signal
 import subprocess
+import threading
 import logging
 import argparse
-import psutil
-import json
 from pathlib import Path
 
+# Backend packages (utils.browser_launcher) are importable from here on;
+# added once rather than on every browser launch
+_BACKEND_DIR = str(Path(__file__).parent.absolute() / "backend")
+if _BACKEND_DIR not in sys.path:
+    sys.path.insert(0, _BACKEND_DIR)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Keeps child processes from opening console windows on Windows
+_NO_WINDOW = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+
+def _pid_alive(pid):
+    """Signal-0 liveness probe; always True on Windows, where os.kill
+    terminates the process instead of probing it"""
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # EPERM: the process exists but belongs to another user
+        pass
+    return True
+
 class SimpleLauncher:
+    # Seconds a port probe result is reused
+    PORT_CHECK_TTL = 0.5
+    # Seconds to wait on one loopback connect; a listening port answers in
+    # microseconds and a closed one is refused at once
+    PORT_PROBE_TIMEOUT = 0.05
+    
     def __init__(self):
         self.project_root = Path(__file__).parent.absolute()
         self.processes = {}
         self.pid_file = self.project_root / "ptah.pids"
+        # Child output goes to files here rather than the launcher's stdio,
+        # which can fill up and block a child when nobody drains it
+        self.log_dir = self.project_root / "logs"
+        # Resolved once so npm runs without a shell (finds npm.cmd on Windows)
+        self.npm = shutil.which("npm") or "npm"
+        # port -> (probe time, in use); answers repeated checks within a
+        # status render without another connect
+        self._port_checks = {}
         
     def is_port_in_use(self, port):
         """Check if a port is in use"""
+        now = time.monotonic()
+        cached = self._port_checks.get(port)
+        if cached is not None and now - cached[0] < self.PORT_CHECK_TTL:
+            return cached[1]
+        
         try:
-            import socket
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(1)
-                result = s.connect_ex(('127.0.0.1', port))
-                return result == 0
+                s.settimeout(self.PORT_PROBE_TIMEOUT)
+                result = s.connect_ex(('127.0.0.1', port)) == 0
         except:
-            return False
+            result = False
+        
+        self._port_checks[port] = (now, result)
+        return result
+    
+    async def wait_for_port(self, port, process=None, timeout=30.0, ready=None):
+        """
+        Wait until something accepts connections on a port
+        
+        Probes back off from 10ms to 250ms, so readiness is noticed almost as
+        soon as the server listens. Gives up early if process exits. If a
+        ready event is given, setting it ends the wait at once; the probes
+        remain as the fallback.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        delay = 0.01
+        
+        while loop.time() < deadline:
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection('127.0.0.1', port), timeout=self.PORT_PROBE_TIMEOUT
+                )
+                writer.close()
+                return True
+            except (OSError, asyncio.TimeoutError):
+                pass
+            
+            if process is not None and process.poll() is not None:
+                return False
+            
+            if ready is None:
+                await asyncio.sleep(delay)
+            else:
+                try:
+                    await asyncio.wait_for(ready.wait(), timeout=delay)
+                    return True
+                except asyncio.TimeoutError:
+                    pass
+            delay = min(delay * 2, 0.25)
+        
+        return False
     
     def save_pids(self):
         """Save process IDs to file"""
+        import json
+        
         pids = {}
         for name, process in self.processes.items():
             if process and process.poll() is None:
                 pids[name] = process.pid
         
+        # Written beside the real file and swapped in, so a reader never
+        # sees a half-written pid file
+        tmp_file = self.pid_file.with_suffix('.tmp')
         try:
-            with open(self.pid_file, 'w') as f:
+            with open(tmp_file, 'w') as f:
                 json.dump(pids, f)
+            os.replace(tmp_file, self.pid_file)
         except Exception as e:
             logger.warning(f"Failed to save PIDs: {e}")
     
     def load_pids(self):
         """Load process IDs from file"""
+        import json
+        
         if not self.pid_file.exists():
             return {}
         
@@ -60,24 +151,36 @@ class SimpleLauncher:
     
     def kill_existing_processes(self):
         """Kill any existing Ptaḥ processes"""
+        # Nothing saved and nothing listening is the usual cold start; skip
+        # loading psutil and the process walk entirely
+        if not self.pid_file.exists() and not any(self.is_port_in_use(port) for port in (8000, 5173)):
+            return
+        
+        # Imported here so --status and --stop don't pay for loading psutil
+        import psutil
+        
         logger.info("Checking for existing Ptaḥ processes...")
         
         saved_pids = self.load_pids()
         killed_any = False
         
         for name, pid in saved_pids.items():
+            if not _pid_alive(pid):
+                continue
             try:
-                if psutil.pid_exists(pid):
-                    process = psutil.Process(pid)
-                    cmdline = ' '.join(process.cmdline())
-                    if 'app.py' in cmdline or 'npm' in cmdline:
-                        logger.info(f"Killing existing {name} process (PID: {pid})")
-                        process.terminate()
-                        try:
-                            process.wait(timeout=5)
-                        except psutil.TimeoutExpired:
-                            process.kill()
-                        killed_any = True
+                # Process() raises NoSuchProcess for a dead PID, so no separate
+                # existence check; the command line is still checked because
+                # the PID may have been reused by an unrelated program
+                process = psutil.Process(pid)
+                cmdline = ' '.join(process.cmdline())
+                if 'app.py' in cmdline or 'npm' in cmdline:
+                    logger.info(f"Killing existing {name} process (PID: {pid})")
+                    process.terminate()
+                    try:
+                        process.wait(timeout=5)
+                    except psutil.TimeoutExpired:
+                        process.kill()
+                    killed_any = True
             except (psutil.NoSuchProcess, psutil.TimeoutExpired, psutil.AccessDenied):
                 pass
         
@@ -95,67 +198,88 @@ class SimpleLauncher:
     
     def kill_process_on_port(self, port):
         """Kill process using a specific port"""
+        # Listening sockets come straight from the OS tables, so no netstat
+        # or lsof is spawned and no command output is parsed
+        import psutil
+        
+        self._port_checks.pop(port, None)
         try:
-            import subprocess
-            import os
-            
-            if os.name == 'nt':  # Windows
-                result = subprocess.run(
-                    f'netstat -ano | findstr :{port}',
-                    shell=True, capture_output=True, text=True
-                )
-                for line in result.stdout.split('\n'):
-                    if f':{port}' in line and 'LISTENING' in line:
-                        parts = line.split()
-                        if len(parts) > 4:
-                            pid = parts[-1]
-                            try:
-                                subprocess.run(f'taskkill /F /PID {pid}', shell=True, check=True)
-                                logger.info(f"Killed process (PID: {pid}) using port {port}")
-                                return
-                            except:
-                                pass
-            else:  # Linux/Mac
-                result = subprocess.run(
-                    f'lsof -ti:{port}',
-                    shell=True, capture_output=True, text=True
-                )
-                if result.stdout.strip():
-                    pids = result.stdout.strip().split('\n')
-                    for pid in pids:
-                        try:
-                            subprocess.run(f'kill -9 {pid}', shell=True, check=True)
-                            logger.info(f"Killed process (PID: {pid}) using port {port}")
-                        except:
-                            pass
+            pids = {
+                conn.pid for conn in psutil.net_connections(kind='tcp')
+                if conn.laddr and conn.laddr.port == port
+                and conn.status == psutil.CONN_LISTEN and conn.pid
+            }
+            for pid in pids:
+                try:
+                    psutil.Process(pid).kill()
+                    logger.info(f"Killed process (PID: {pid}) using port {port}")
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
         except Exception as e:
             logger.warning(f"Failed to kill process on port {port}: {e}")
     
+    def open_log(self, name):
+        """Open the append-mode output log for a child process"""
+        self.log_dir.mkdir(exist_ok=True)
+        return open(self.log_dir / f"{name}.log", 'ab')
+    
+    @staticmethod
+    def pump_output(stream, log, sentinel, on_ready):
+        """
+        Copy a child's piped output into its log, calling on_ready once when
+        a line containing sentinel goes past
+        
+        Runs on a daemon thread for the life of the child so the pipe never
+        fills up and blocks it.
+        """
+        with stream, log:
+            for line in stream:
+                log.write(line)
+                log.flush()
+                if on_ready is not None and sentinel in line:
+                    try:
+                        on_ready()
+                    except RuntimeError:
+                        # The launcher's event loop is already gone; keep
+                        # draining regardless
+                        pass
+                    on_ready = None
+    
     def cleanup_on_exit(self):
         """Cleanup when exiting"""
         if self.pid_file.exists():
             self.pid_file.unlink()
     
-    def start_backend(self):
+    async def start_backend(self):
         """Start backend server"""
         logger.info("Starting backend...")
         backend_dir = self.project_root / "backend"
         
         try:
+            log = self.open_log("backend")
             self.processes["backend"] = subprocess.Popen(
                 [sys.executable, "app.py"],
                 cwd=backend_dir,
-                env=os.environ.copy(),
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                creationflags=_NO_WINDOW
             )
             
-            self.save_pids()
+            # Uvicorn's startup banner marks readiness the moment it is
+            # printed, instead of at the next port probe
+            loop = asyncio.get_running_loop()
+            ready = asyncio.Event()
+            threading.Thread(
+                target=self.pump_output,
+                args=(self.processes["backend"].stdout, log,
+                      b"Application startup complete", lambda: loop.call_soon_threadsafe(ready.set)),
+                daemon=True
+            ).start()
 
-            for _ in range(30):
-                if self.is_port_in_use(8000):
-                    logger.info(f"✓ Backend started (PID: {self.processes['backend'].pid})")
-                    return True
-                time.sleep(1)
+            if await self.wait_for_port(8000, self.processes["backend"], ready=ready):
+                logger.info(f"✓ Backend started (PID: {self.processes['backend'].pid})")
+                return True
             
             logger.error("Backend failed to start within timeout")
             return False
@@ -164,27 +288,27 @@ class SimpleLauncher:
             logger.error(f"Failed to start backend: {e}")
             return False
     
-    def start_frontend(self):
+    async def start_frontend(self):
         """Start frontend server"""
         logger.info("Starting frontend...")
         frontend_dir = self.project_root / "frontend"
         
         try:
-            self.processes["frontend"] = subprocess.Popen(
-                ["npm", "run", "dev"],
-                cwd=frontend_dir,
-                shell=True,
-                env=os.environ.copy(),
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-            
-            self.save_pids()
+            # The child keeps its own handle, so the launcher's copy is
+            # closed as soon as the process is spawned
+            with self.open_log("frontend") as log:
+                self.processes["frontend"] = subprocess.Popen(
+                    [self.npm, "run", "dev"],
+                    cwd=frontend_dir,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    creationflags=_NO_WINDOW
+                )
 
-            for _ in range(30):
-                if self.is_port_in_use(5173):
-                    logger.info(f"✓ Frontend started (PID: {self.processes['frontend'].pid})")
-                    return True
-                time.sleep(1)
+            if await self.wait_for_port(5173, self.processes["frontend"]):
+                logger.info(f"✓ Frontend started (PID: {self.processes['frontend'].pid})")
+                return True
             
             logger.error("Frontend failed to start within timeout")
             return False
@@ -193,12 +317,29 @@ class SimpleLauncher:
             logger.error(f"Failed to start frontend: {e}")
             return False
     
+    async def start_servers(self, backend=True, frontend=True):
+        """
+        Start the backend and frontend side by side
+        
+        Neither needs the other to be up first, so startup takes as long as
+        the slower of the two rather than both in turn.
+        """
+        starts = []
+        if backend:
+            starts.append(self.start_backend())
+        if frontend:
+            starts.append(self.start_frontend())
+        
+        results = await asyncio.gather(*starts)
+        # One pid file write covering everything that was spawned
+        self.save_pids()
+        return all(results)
+    
     def start_browser(self, search_query="", frontend_running=False):
         """Start browser - intelligently choose what to open"""
         logger.info("Starting browser...")
         
         try:
-            sys.path.insert(0, str(self.project_root / "backend"))
             from utils.browser_launcher import BrowserLauncher
             
             launcher = BrowserLauncher()
@@ -232,17 +373,29 @@ class SimpleLauncher:
         """Stop all processes"""
         logger.info("Stopping all processes...")
         
+        # Signal every process first so they shut down side by side, then
+        # wait on them against one shared deadline. These are our own
+        # children, so poll() rather than _pid_alive: it also reaps them, and
+        # signal 0 succeeds on an exited child that hasn't been reaped yet
+        stopping = {}
         for name, process in self.processes.items():
             try:
                 if process and process.poll() is None:
                     logger.info(f"Stopping {name}...")
                     process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                        logger.info(f"✓ {name} stopped")
-                    except subprocess.TimeoutExpired:
-                        process.kill()
-                        logger.warning(f"Force killed {name}")
+                    stopping[name] = process
+            except Exception as e:
+                logger.warning(f"Error stopping {name}: {e}")
+        
+        deadline = time.monotonic() + 5
+        for name, process in stopping.items():
+            try:
+                try:
+                    process.wait(timeout=max(0, deadline - time.monotonic()))
+                    logger.info(f"✓ {name} stopped")
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    logger.warning(f"Force killed {name}")
             except Exception as e:
                 logger.warning(f"Error stopping {name}: {e}")
         
@@ -259,25 +412,45 @@ class SimpleLauncher:
         print("PTAḤ STATUS")
         print("="*50)
         
+        # Probe each port once for the whole render
+        backend_up = self.is_port_in_use(8000)
+        frontend_up = self.is_port_in_use(5173)
 
-        if self.is_port_in_use(8000):
+        if backend_up:
             print("✓ Backend API          RUNNING    http://127.0.0.1:8000")
         else:
             print("✗ Backend API          STOPPED")
         
 
-        if self.is_port_in_use(5173):
+        if frontend_up:
             print("✓ Frontend Server      RUNNING    http://localhost:5173")
         else:
             print("✗ Frontend Server      STOPPED")
         
         print("="*50)
-        if self.is_port_in_use(5173):
+        if frontend_up:
             print("Application: http://localhost:5173")
-        if self.is_port_in_use(8000):
+        if backend_up:
             print("API Docs: http://127.0.0.1:8000/docs")
         print("="*50 + "\n")
 
+def wait_for_shutdown_signal():
+    """Block until Ctrl+C or a termination signal arrives, without waking in between"""
+    stop_requested = threading.Event()
+    
+    def request_stop(signum, frame):
+        stop_requested.set()
+    
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):  # SIGBREAK: Ctrl+Break on Windows
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), request_stop)
+    
+    # A wait without timeout is interrupted by signals on POSIX; on Windows
+    # it would never see Ctrl+C, so it wakes once a second there
+    timeout = 1 if os.name == 'nt' else None
+    while not stop_requested.wait(timeout):
+        pass
+
 def main():
     parser = argparse.ArgumentParser(description="Ptaḥ Simple Launcher")
     parser.add_argument("--no-backend", action="store_true", help="Don't start backend")
@@ -305,8 +478,8 @@ def main():
             logger.info("Installing dependencies...")
             subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], 
                           cwd=launcher.project_root, check=True)
-            subprocess.run(["npm", "install"], cwd=launcher.project_root / "frontend", 
-                          shell=True, check=True)
+            subprocess.run([launcher.npm, "install"], cwd=launcher.project_root / "frontend", 
+                          check=True)
             logger.info("✓ Dependencies installed")
             return
         
@@ -315,13 +488,10 @@ def main():
 
         logger.info("🚀 Starting Ptaḥ...")
         
-        success = True
-        
-        if not args.no_backend:
-            success &= launcher.start_backend()
-        
-        if not args.no_frontend and success:
-            success &= launcher.start_frontend()
+        success = asyncio.run(launcher.start_servers(
+            backend=not args.no_backend,
+            frontend=not args.no_frontend
+        ))
         
 
         if not args.no_browser and success:
@@ -332,12 +502,8 @@ def main():
             logger.info("✅ All components started!")
             launcher.show_status()
             
-
-            try:
-                while True:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                logger.info("Shutting down...")
+            wait_for_shutdown_signal()
+            logger.info("Shutting down...")
         
         launcher.stop_all()
         
@@ -1,9 +1,11 @@
 """
 Monitor clipboard for new content and add to ingestion queue
 """
+import os
 import sys
+import signal
 import logging
-import time
+import threading
 from pathlib import Path
 
 # Add backend to path
@@ -11,35 +13,36 @@ backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
 from utils.clipboard_watcher import ClipboardWatcher
-import requests
+from utils.capture_sink import CaptureSink
+
+# Where captures are written, relative to the working directory
+CLIP_DIR = Path("data/clipboard")
 
 class ClipboardIngestor:
     """Monitor clipboard and send content to ingestion API"""
     
     def __init__(self, api_url: str = "http://127.0.0.1:8000"):
         self.api_url = api_url
+        # Every capture is one JSON line in a single append-only file; the
+        # sink is opened when monitoring starts
+        self.capture_path = CLIP_DIR / "captures.jsonl"
+        self.sink = None
         self.watcher = ClipboardWatcher(callback=self.handle_clipboard_content)
+        # Set by Ctrl+C; the main thread sleeps on it instead of polling
+        self._stop = threading.Event()
     
     def handle_clipboard_content(self, content: str):
         """Handle new clipboard content"""
         try:
-            # Filter out very short content
-            if len(content.strip()) < 50:
-                return
-            
-            print(f"New clipboard content: {len(content)} characters")
-            
-            # TODO: Send to ingestion API
+            # TODO: Send to ingestion API (import the HTTP client lazily when
+            # this is wired up, so startup doesn't pay for it)
             # For now, just log and save to file
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"clipboard_content_{timestamp}.txt"
-            
-            with open(f"data/clipboard/{filename}", "w", encoding="utf-8") as f:
-                f.write(f"Captured at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("=" * 50 + "\n")
-                f.write(content)
+            record = self.sink.push(content)
+            if record is None:
+                return
             
-            print(f"Saved clipboard content to: {filename}")
+            print(f"New clipboard content: {record.length} characters")
+            print(f"Saved clipboard content to: {self.capture_path}")
             
         except Exception as e:
             logging.error(f"Error handling clipboard content: {e}")
@@ -47,16 +50,23 @@ class ClipboardIngestor:
     def start(self):
         """Start monitoring clipboard"""
         # Ensure data directory exists
-        Path("data/clipboard").mkdir(parents=True, exist_ok=True)
+        CLIP_DIR.mkdir(parents=True, exist_ok=True)
         
+        self.sink = CaptureSink(self.capture_path, min_len=50)
         self.watcher.start()
         
+        previous_handler = signal.signal(signal.SIGINT, lambda *_: self._stop.set())
         try:
             print("Clipboard monitor started. Copy text to capture it. Press Ctrl+C to stop.")
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
+            # Windows only runs signal handlers between waits, so wake
+            # periodically there; elsewhere block until the event is set
+            wait_timeout = 1 if os.name == 'nt' else None
+            while not self._stop.wait(wait_timeout):
+                pass
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
             self.watcher.stop()
+            self.sink.close()
             print("Clipboard monitor stopped.")
 
 def main():
@@ -1,7 +1,9 @@
 """
 Complete research session: launch browser + monitor clipboard
 """
+import os
 import sys
+import signal
 import logging
 import time
 import threading
@@ -13,6 +15,22 @@ sys.path.insert(0, str(backend_path))
 
 from utils.browser_launcher import BrowserLauncher
 from utils.clipboard_watcher import ClipboardWatcher
+from utils.capture_sink import Capture, CaptureSink, encode_record, iter_records
+
+logger = logging.getLogger(__name__)
+
+# Parent of the per-session directories, relative to the working directory
+SESSION_ROOT = Path("data/sessions")
+
+def _format_capture(record: Capture) -> bytes:
+    """One capture's block in captured_content.txt"""
+    return (
+        f"Timestamp: {record.timestamp}\n"
+        f"Length: {record.length} characters\n"
+        f"{'-' * 30}\n"
+        f"{record.content}"
+        f"\n\n{'=' * 50}\n\n"
+    ).encode('utf-8')
 
 class ResearchSession:
     """Orchestrate a complete research session"""
@@ -20,31 +38,37 @@ class ResearchSession:
     def __init__(self):
         self.browser_launcher = BrowserLauncher()
         self.clipboard_watcher = ClipboardWatcher(callback=self.handle_clipboard)
-        self.session_data = []
+        # Captures are streamed to session.jsonl in the session directory as
+        # they arrive; only a count is kept in memory
+        self.sink = None
+        # Set by Ctrl+C; the main thread sleeps on it instead of polling
+        self._stop = threading.Event()
     
     def handle_clipboard(self, content: str):
         """Handle clipboard content during research session"""
-        if len(content.strip()) < 20:
+        record = self.sink.push(content)
+        if record is None:
             return
-            
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         
-        self.session_data.append({
-            'timestamp': timestamp,
-            'content': content,
-            'length': len(content)
-        })
-        
-        print(f"[{timestamp}] Captured: {len(content)} chars - {content[:100]}...")
+        # Lazy %-formatting: the 100-char preview is only cut if the record
+        # is actually emitted
+        logger.info("[%s] Captured: %d chars - %.100s...",
+                    record.timestamp, record.length, content)
     
     def start_session(self, search_query: str = ""):
         """Start a complete research session"""
+        previous_handler = signal.signal(signal.SIGINT, lambda *_: self._stop.set())
         try:
             print("Starting research session...")
             
             # Create session directory
-            session_dir = Path("data/sessions") / time.strftime("%Y%m%d_%H%M%S")
+            session_dir = SESSION_ROOT / time.strftime("%Y%m%d_%H%M%S")
             session_dir.mkdir(parents=True, exist_ok=True)
+            # captured_content.txt is appended as captures arrive
+            content_file = session_dir / "captured_content.txt"
+            content_file.write_bytes(b"Research Session Content\n" + b"=" * 50 + b"\n\n")
+            self.sink = CaptureSink(session_dir / "session.jsonl", min_len=20,
+                                    text_path=content_file, text_format=_format_capture)
             
             # Launch browser
             print(f"Launching browser with query: '{search_query}'")
@@ -59,17 +83,31 @@ class ResearchSession:
             print("Research session active. Browser launched and clipboard monitored.")
             print("Copy text from web pages to capture it. Press Ctrl+C to end session.")
             
-            # Keep session running
-            while True:
-                time.sleep(1)
-                if not self.browser_launcher.is_running():
-                    print("Browser closed, ending session...")
-                    break
-        
-        except KeyboardInterrupt:
-            print("\nEnding research session...")
+            # A thread blocked on the browser process ends the session the
+            # moment it exits, instead of polling is_running()
+            browser = self.browser_launcher.process
+            browser_closed = threading.Event()
+            
+            def watch_browser():
+                browser.wait()
+                browser_closed.set()
+                self._stop.set()
+            
+            threading.Thread(target=watch_browser, daemon=True).start()
+            
+            # Keep session running until Ctrl+C or the browser closes. Windows
+            # only runs signal handlers between waits, so wake periodically there
+            wait_timeout = 1 if os.name == 'nt' else None
+            while not self._stop.wait(wait_timeout):
+                pass
+            
+            if browser_closed.is_set():
+                print("Browser closed, ending session...")
+            else:
+                print("\nEnding research session...")
         
         finally:
+            signal.signal(signal.SIGINT, previous_handler)
             self.end_session(session_dir)
     
     def end_session(self, session_dir: Path):
@@ -82,34 +120,39 @@ class ResearchSession:
             if self.browser_launcher.is_running():
                 self.browser_launcher.close()
             
+            if self.sink is not None:
+                self.sink.close()
+            
             # Save session data
-            if self.session_data:
-                import json
-                
-                session_file = session_dir / "session_data.json"
-                with open(session_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.session_data, f, indent=2, ensure_ascii=False)
-                
-                # Save combined text content
-                content_file = session_dir / "captured_content.txt"
-                with open(content_file, 'w', encoding='utf-8') as f:
-                    f.write("Research Session Content\n")
-                    f.write("=" * 50 + "\n\n")
-                    
-                    for item in self.session_data:
-                        f.write(f"Timestamp: {item['timestamp']}\n")
-                        f.write(f"Length: {item['length']} characters\n")
-                        f.write("-" * 30 + "\n")
-                        f.write(item['content'])
-                        f.write("\n\n" + "=" * 50 + "\n\n")
+            if self.sink is not None and self.sink.count:
+                self._write_session_files(session_dir)
                 
                 print(f"Session data saved to: {session_dir}")
-                print(f"Captured {len(self.session_data)} clipboard items")
+                print(f"Captured {self.sink.count} clipboard items")
             else:
+                (session_dir / "captured_content.txt").unlink(missing_ok=True)
                 print("No content captured during session")
         
         except Exception as e:
             print(f"Error ending session: {e}")
+    
+    def _write_session_files(self, session_dir: Path):
+        """
+        Write session_data.json from session.jsonl
+        
+        The array is produced record by record, so memory stays at one
+        capture however long the session ran, and keeps the indented layout
+        of json.dump(..., indent=2).
+        """
+        session_file = session_dir / "session_data.json"
+        with open(session_file, 'wb') as f:
+            f.write(b"[")
+            separator = b"\n"
+            for record in iter_records(session_dir / "session.jsonl"):
+                item = encode_record(record, indent=True)
+                f.write(separator + b"  " + item.replace(b"\n", b"\n  "))
+                separator = b",\n"
+            f.write(b"\n]")
 
 def main():
     logging.basicConfig(level=logging.INFO)